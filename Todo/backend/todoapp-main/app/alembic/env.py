@@ -1,8 +1,9 @@
+import asyncio
 from logging.config import fileConfig
 
 from alembic import context
 from sqlmodel import SQLModel
-from database import engine  # Import your SQLModel engine
+from database import DATABASE_URL, engine, schema_lock  # Import your SQLModel engine
 from models import User, Role, Task, TaskAssignment  # Import your models here
 
 # this is the Alembic Config object, which provides
@@ -14,6 +15,9 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
+# Migrate the same database the app talks to
+config.set_main_option("sqlalchemy.url", DATABASE_URL)
+
 # Add your model's MetaData object here for 'autogenerate' support
 target_metadata = SQLModel.metadata  # Set target_metadata to SQLModel's metadata
 
@@ -45,22 +49,36 @@ def run_migrations_offline() -> None:
         context.run_migrations()
 
 
+def do_run_migrations(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        # SQLite cannot ALTER most constraints in place
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_async_migrations() -> None:
+    connectable = engine  # Use the engine imported from your database module
+
+    # Several workers or replicas may try to migrate at boot; one goes first,
+    # the rest find the database already at head.
+    async with schema_lock():
+        async with connectable.connect() as connection:
+            await connection.run_sync(do_run_migrations)
+    await connectable.dispose()
+
+
 def run_migrations_online() -> None:
     """Run migrations in 'online' mode.
 
     In this scenario we need to use the existing engine
     and associate a connection with the context.
     """
-    connectable = engine  # Use the engine imported from your database module
-
-    with connectable.connect() as connection:
-        context.configure(
-            connection=connection,
-            target_metadata=target_metadata
-        )
-
-        with context.begin_transaction():
-            context.run_migrations()
+    asyncio.run(run_async_migrations())
 
 
 if context.is_offline_mode():
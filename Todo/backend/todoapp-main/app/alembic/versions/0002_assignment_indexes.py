@@ -0,0 +1,38 @@
+"""index task assignment lookups
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keep the oldest row of any duplicated assignment so the unique index can be built
+    op.execute(
+        """
+        DELETE FROM taskassignment
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM taskassignment GROUP BY task_id, user_id
+        )
+        """
+    )
+    op.create_index("uq_taskassignment_task_user", "taskassignment", ["task_id", "user_id"], unique=True)
+    op.create_index("ix_taskassignment_user_id", "taskassignment", ["user_id"])
+    op.create_index("ix_taskassignment_status", "taskassignment", ["status"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_taskassignment_status", table_name="taskassignment")
+    op.drop_index("ix_taskassignment_user_id", table_name="taskassignment")
+    op.drop_index("uq_taskassignment_task_user", table_name="taskassignment")
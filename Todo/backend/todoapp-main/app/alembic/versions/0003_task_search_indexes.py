@@ -0,0 +1,33 @@
+"""index task search and title ordering
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match models.TASK_SEARCH_VECTOR
+TASK_SEARCH_VECTOR = "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, ''))"
+
+
+def upgrade() -> None:
+    op.create_index("ix_task_title_id", "task", ["title", "id"])
+    if op.get_bind().dialect.name == "postgresql":
+        op.create_index("ix_task_search", "task", [sa.text(TASK_SEARCH_VECTOR)], postgresql_using="gin")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.drop_index("ix_task_search", table_name="task")
+    op.drop_index("ix_task_title_id", table_name="task")
@@ -0,0 +1,52 @@
+"""refresh tokens and revoked access tokens
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "refreshtoken",
+        sa.Column("jti", sa.String(), nullable=False),
+        sa.Column("family", sa.String(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("rotated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("revoked", sa.Boolean(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("jti"),
+    )
+    op.create_index("ix_refreshtoken_family", "refreshtoken", ["family"])
+    op.create_index("ix_refreshtoken_user_id", "refreshtoken", ["user_id"])
+    op.create_index("ix_refreshtoken_expires_at", "refreshtoken", ["expires_at"])
+    op.create_table(
+        "revokedtoken",
+        sa.Column("jti", sa.String(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("jti"),
+    )
+    op.create_index("ix_revokedtoken_expires_at", "revokedtoken", ["expires_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_revokedtoken_expires_at", table_name="revokedtoken")
+    op.drop_table("revokedtoken")
+    op.drop_index("ix_refreshtoken_expires_at", table_name="refreshtoken")
+    op.drop_index("ix_refreshtoken_user_id", table_name="refreshtoken")
+    op.drop_index("ix_refreshtoken_family", table_name="refreshtoken")
+    op.drop_table("refreshtoken")
@@ -0,0 +1,44 @@
+"""seed roles and link existing users
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    for name in ("admin", "user"):
+        op.execute(f"INSERT INTO role (name) SELECT '{name}' WHERE NOT EXISTS (SELECT 1 FROM role WHERE name = '{name}')")
+    # Login used to hand out the admin role to the user named "admin" and the
+    # user role to everybody else; keep those users where they were.
+    op.execute(
+        """
+        INSERT INTO userrolelink (user_id, role_id)
+        SELECT u.id, r.id FROM "user" u JOIN role r ON r.name = 'admin'
+        WHERE u.username = 'admin'
+          AND NOT EXISTS (SELECT 1 FROM userrolelink l WHERE l.user_id = u.id AND l.role_id = r.id)
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO userrolelink (user_id, role_id)
+        SELECT u.id, r.id FROM "user" u JOIN role r ON r.name = 'user'
+        WHERE NOT EXISTS (SELECT 1 FROM userrolelink l WHERE l.user_id = u.id)
+        """
+    )
+
+
+def downgrade() -> None:
+    # Role assignments are data; leave them in place
+    pass
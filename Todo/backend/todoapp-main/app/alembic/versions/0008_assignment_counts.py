@@ -0,0 +1,43 @@
+"""assignment counters for /admin/stats
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "assignmentcount",
+        sa.Column("scope", sa.String(), nullable=False),
+        sa.Column("key", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("scope", "key", "status"),
+    )
+    # Start from the real numbers; the routes keep them current from here on
+    for scope, column in (("user", "user_id"), ("task", "task_id")):
+        op.execute(
+            f"""
+            INSERT INTO assignmentcount (scope, key, status, count)
+            SELECT '{scope}', {column}, status, count(*) FROM taskassignment
+            WHERE task_id IS NOT NULL AND user_id IS NOT NULL
+            GROUP BY {column}, status
+            """
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("assignmentcount")
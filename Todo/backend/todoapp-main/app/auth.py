@@ -1,28 +1,51 @@
+import os
+import time
+import uuid
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 from sqlmodel import select
-from models import User
+from models import RefreshToken, Role, User, UserRoleLink, utcnow
+from cache import TTLCache
 from database import get_db
-from passlib.context import CryptContext
+from hashing import hasher
+from instrumentation import span
+from ratelimit import rate_limiter
+from revocation import denylist
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from pydantic import BaseModel
-from typing import List
+from typing import FrozenSet, Iterable, List, Optional, Tuple
 
 router = APIRouter()
 
 SECRET_KEY = "11" 
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
+
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))  # 0 disables the cache
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+# Trust the signed claims and never look the user up; deletions and role
+# changes then only take effect when the token expires.
+AUTH_TRUST_CLAIMS = os.getenv("AUTH_TRUST_CLAIMS", "false").lower() in ("1", "true", "yes")
+
+# What each role may do; anything every signed-in user can do needs no permission
+ROLE_PERMISSIONS = {
+    "admin": {"tasks:write", "tasks:assign", "tasks:read_all", "users:read", "users:manage", "events:all"},
+    "user": set(),
+}
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token", auto_error=False)
 
 class Token(BaseModel):
     access_token: str
     token_type: str
     roles: List[str]  # Added 'roles' field in the Token response
+    refresh_token: Optional[str] = None
 
 class TokenData(BaseModel):
     username: str
@@ -37,11 +60,17 @@ class LoginRequest(BaseModel):
     username: str
     password: str
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await hasher.verify(plain_password, hashed_password)
+
+async def get_password_hash(password: str) -> str:
+    return await hasher.hash(password)
 
 def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     to_encode = data.copy()
@@ -49,67 +78,315 @@ def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> User:
+async def create_refresh_token(db: AsyncSession, user_id: int, username: str, roles: List[str], family: Optional[str] = None) -> str:
+    """Records a refresh token in the caller's transaction and returns it encoded.
+
+    ``family`` ties a token to the ones it was rotated from, so reuse of any
+    of them can end the whole login.
+    """
+    jti = uuid.uuid4().hex
+    family = family or jti
+    expire = utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    db.add(RefreshToken(jti=jti, family=family, user_id=user_id, expires_at=expire))
+    claims = {"sub": username, "uid": user_id, "roles": roles, "type": "refresh", "family": family, "jti": jti, "exp": expire}
+    return jwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
+
+def decode_refresh_token(token: str) -> dict:
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    if payload.get("type") != "refresh" or not payload.get("jti") or not payload.get("family"):
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    return payload
+
+class PrincipalCache:
+    """LRU of authenticated users keyed by token subject.
+
+    Entries live for at most ``ttl`` seconds and never past the ``exp`` of the
+    token that populated them.
+    """
+
+    def __init__(self, max_size: int = AUTH_CACHE_SIZE, ttl: int = AUTH_CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self._entries = TTLCache(max_size)
+
+    def get(self, username: str) -> Optional[User]:
+        return self._entries.get(username)
+
+    def set(self, username: str, user: User, token_exp: float):
+        # Cache a detached copy so no session state leaks between requests
+        snapshot = User(id=user.id, username=user.username, hashed_password=user.hashed_password)
+        self._entries.set(username, snapshot, min(time.time() + self.ttl, token_exp))
+
+    def invalidate(self, username: Optional[str] = None, user_id: Optional[int] = None):
+        if username is not None:
+            self._entries.pop(username)
+        if user_id is not None:
+            for key, user in self._entries.items():
+                if user.id == user_id:
+                    self._entries.pop(key)
+
+    def clear(self):
+        self._entries.clear()
+
+
+principal_cache = PrincipalCache()
+
+
+class PermissionCache:
+    """LRU of resolved permission sets keyed by user id.
+
+    Role changes made through the ORM in this process invalidate entries at
+    once; ``ttl`` bounds how long other workers keep serving the old set.
+    """
+
+    def __init__(self, max_size: int = AUTH_CACHE_SIZE, ttl: int = AUTH_CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self._entries = TTLCache(max_size)
+
+    def get(self, user_id: int) -> Optional[FrozenSet[str]]:
+        return self._entries.get(user_id)
+
+    def set(self, user_id: int, permissions: FrozenSet[str]):
+        self._entries.set(user_id, permissions, time.time() + self.ttl)
+
+    def invalidate(self, user_id: int):
+        self._entries.pop(user_id)
+
+    def clear(self):
+        self._entries.clear()
+
+
+permission_cache = PermissionCache()
+
+
+def invalidate_user(username: Optional[str] = None, user_id: Optional[int] = None):
+    principal_cache.invalidate(username=username, user_id=user_id)
+    if user_id is not None:
+        permission_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_changed_principals(session, flush_context):
+    # Editing user.roles or role.users marks the owning object dirty rather
+    # than adding UserRoleLink objects, hence the User and Role checks.
+    for obj in list(session.deleted) + list(session.dirty):
+        if isinstance(obj, User):
+            invalidate_user(username=obj.username, user_id=obj.id)
+        elif isinstance(obj, Role):
+            permission_cache.clear()
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, UserRoleLink):
+            invalidate_user(user_id=obj.user_id)
+
+
+def permissions_for(roles: Iterable[str]) -> FrozenSet[str]:
+    return frozenset().union(*(ROLE_PERMISSIONS.get(role, ()) for role in roles))
+
+
+async def load_roles(db: AsyncSession, user_id: int) -> List[str]:
+    result = await db.execute(
+        select(Role.name).join(UserRoleLink, UserRoleLink.role_id == Role.id).where(UserRoleLink.user_id == user_id).order_by(Role.name)
+    )
+    return list(result.scalars())
+
+
+async def grant_roles(db: AsyncSession, user_id: int, names: List[str]):
+    """Links the user to the named roles in the caller's transaction, creating missing roles."""
+    roles = {role.name: role for role in (await db.execute(select(Role).where(Role.name.in_(names)))).scalars()}
+    for name in names:
+        if name not in roles:
+            roles[name] = Role(name=name)
+            db.add(roles[name])
+    await db.flush()
+    db.add_all(UserRoleLink(user_id=user_id, role_id=roles[name].id) for name in names)
+    await db.flush()
+
+
+async def user_permissions(db: AsyncSession, user: User, claims: dict) -> FrozenSet[str]:
+    if AUTH_TRUST_CLAIMS:
+        return permissions_for(claims.get("roles", []))
+    permissions = permission_cache.get(user.id)
+    if permissions is None:
+        with span("permissions"):
+            permissions = permissions_for(await load_roles(db, user.id))
+        permission_cache.set(user.id, permissions)
+    return permissions
+
+
+async def user_from_token(token: str, db: AsyncSession) -> Tuple[User, dict]:
+    """Validates an access token and returns its user and claims; raises 401 otherwise."""
     credentials_exception = HTTPException(
         status_code=401,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        with span("jwt"):
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
+        if username is None or payload.get("type") == "refresh":
             raise credentials_exception
         token_data = TokenData(username=username, roles=payload.get("roles", []))
     except JWTError:
         raise credentials_exception
 
-    result = await db.execute(select(User).where(User.username == token_data.username))
-    user = result.scalar_one_or_none()
+    if denylist.is_revoked(payload.get("jti")):
+        raise credentials_exception
+
+    if AUTH_TRUST_CLAIMS and payload.get("uid") is not None:
+        return User(id=payload["uid"], username=token_data.username), payload
+
+    user = principal_cache.get(token_data.username)
+    if user is not None:
+        return user, payload
+
+    with span("user_lookup"):
+        result = await db.execute(select(User).where(User.username == token_data.username))
+        user = result.scalar_one_or_none()
     if user is None:
         raise credentials_exception
+    principal_cache.set(token_data.username, user, payload["exp"])
+    return user, payload
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> User:
+    user, _ = await user_from_token(token, db)
     return user
 
+async def user_or_permission(token: str, db: AsyncSession, user_id: Optional[int], permission: str) -> User:
+    """The current user, once they are known to be ``user_id`` or to hold ``permission``; 403 otherwise."""
+    user, claims = await user_from_token(token, db)
+    if user.id != user_id and permission not in await user_permissions(db, user, claims):
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    return user
+
+def require_permission(permission: str):
+    """Dependency returning the current user once they are known to hold ``permission``.
+
+    Permission sets come from the cache, so after a user's first request
+    this adds no queries.
+    """
+    async def current_user_with_permission(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> User:
+        user, claims = await user_from_token(token, db)
+        if permission not in await user_permissions(db, user, claims):
+            raise HTTPException(status_code=403, detail="Not enough permissions")
+        return user
+
+    return current_user_with_permission
+
+async def may_create_admin(db: AsyncSession, token: Optional[str]) -> bool:
+    if token:
+        user, claims = await user_from_token(token, db)
+        return "users:manage" in await user_permissions(db, user, claims)
+    # Until somebody holds the admin role, the first admin may sign up on their own
+    admins = await db.execute(
+        select(UserRoleLink.user_id).join(Role, Role.id == UserRoleLink.role_id).where(Role.name == "admin").limit(1)
+    )
+    return admins.first() is None
+
 @router.post("/register", response_model=Token, tags=["Auth"])
-async def register(request: RegisterRequest, db: AsyncSession = Depends(get_db)):
+async def register(request: RegisterRequest, token: Optional[str] = Depends(optional_oauth2_scheme), db: AsyncSession = Depends(get_db)):
     username = request.username
     password = request.password
     is_admin = request.is_admin  # This determines the role
+    await rate_limiter.check_username(username)
 
     result = await db.execute(select(User).where(User.username == username))
     existing_user = result.scalar_one_or_none()
 
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already exists.")
+    if is_admin and not await may_create_admin(db, token):
+        raise HTTPException(status_code=403, detail="Only admins can create admin users.")
 
-    hashed_password = get_password_hash(password)
+    # Give the connection back to the pool while bcrypt runs
+    await db.close()
+    hashed_password = await get_password_hash(password)
     new_user = User(username=username, hashed_password=hashed_password)
 
     db.add(new_user)
-    await db.commit()
-    await db.refresh(new_user)
+    await db.flush()
 
     # Assign role based on is_admin
     roles = ["admin"] if is_admin else ["user"]  # Default to "user" if is_admin is False
+    await grant_roles(db, new_user.id, roles)
 
-    access_token = create_access_token(data={"sub": new_user.username, "roles": roles})
+    access_token = create_access_token(data={"sub": new_user.username, "uid": new_user.id, "roles": roles})
+    refresh_token = await create_refresh_token(db, new_user.id, new_user.username, roles)
+    await db.commit()
 
-    return {"access_token": access_token, "token_type": "bearer", "roles": roles}
+    return {"access_token": access_token, "token_type": "bearer", "roles": roles, "refresh_token": refresh_token}
 
 @router.post("/token", response_model=Token, tags=["Auth"])
 async def login(request: LoginRequest, db: AsyncSession = Depends(get_db)):
+    await rate_limiter.check_username(request.username)
     result = await db.execute(select(User).where(User.username == request.username))
     user = result.scalar_one_or_none()
+    await db.close()
 
-    if not user or not verify_password(request.password, user.hashed_password):
+    if not user or not await verify_password(request.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    # Fetch roles from the user data or predefined roles based on the username
-    roles = ["admin"] if user.username == "admin" else ["user"]  # Default to "user" for non-admin users
+    roles = await load_roles(db, user.id)
+
+    access_token = create_access_token(data={"sub": user.username, "uid": user.id, "roles": roles})
+    refresh_token = await create_refresh_token(db, user.id, user.username, roles)
+    await db.commit()
+
+    return {"access_token": access_token, "token_type": "bearer", "roles": roles, "refresh_token": refresh_token}  # Include roles in the response
+
+@router.post("/refresh", response_model=Token, tags=["Auth"])
+async def refresh(request: RefreshRequest, db: AsyncSession = Depends(get_db)):
+    payload = decode_refresh_token(request.refresh_token)
+    now = utcnow()
+
+    # Using a refresh token rotates it; the conditional update makes that
+    # atomic, so two requests racing with the same token can't both win.
+    rotated = await db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.jti == payload["jti"],
+            RefreshToken.rotated_at.is_(None),
+            RefreshToken.revoked.is_(False),
+            RefreshToken.expires_at > now,
+        )
+        .values(rotated_at=now)
+    )
+    if rotated.rowcount != 1:
+        # A used or revoked token coming back means it leaked; end the whole login
+        await db.execute(update(RefreshToken).where(RefreshToken.family == payload["family"]).values(revoked=True))
+        await db.commit()
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+
+    # Re-read the roles so a role change reaches the claims at the next refresh
+    roles = await load_roles(db, payload["uid"])
+    access_token = create_access_token(data={"sub": payload["sub"], "uid": payload["uid"], "roles": roles})
+    refresh_token = await create_refresh_token(db, payload["uid"], payload["sub"], roles, family=payload["family"])
+    await db.commit()
 
-    access_token = create_access_token(data={"sub": user.username, "roles": roles})
+    return {"access_token": access_token, "token_type": "bearer", "roles": roles, "refresh_token": refresh_token}
+
+@router.post("/logout", tags=["Auth"])
+async def logout(request: Optional[LogoutRequest] = None, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        payload = None
+    if payload is None or payload.get("type") == "refresh":
+        raise HTTPException(status_code=401, detail="Could not validate credentials", headers={"WWW-Authenticate": "Bearer"})
+
+    # Decoded first, so a bad refresh token fails the request before anything is revoked
+    family = decode_refresh_token(request.refresh_token)["family"] if request is not None and request.refresh_token else None
+    if payload.get("jti"):
+        await denylist.revoke(db, payload["jti"], payload["exp"])
+    if family is not None:
+        await db.execute(update(RefreshToken).where(RefreshToken.family == family).values(revoked=True))
+    await db.commit()
+    if payload.get("jti"):
+        denylist.remember(payload["jti"], payload["exp"])
 
-    return {"access_token": access_token, "token_type": "bearer", "roles": roles}  # Include roles in the response
+    return {"msg": "Logged out"}
@@ -0,0 +1,109 @@
+"""Assignments per second for POST /admin/assign-task, before and after the
+single-statement insert.
+
+"before" mounts a copy of the previous handler (SELECT the task, SELECT the
+user, INSERT, then the same job and commit) on a scratch route; "after" is
+the real endpoint. Both assign fresh (task, user) pairs, then "repeat" sends
+pairs that already exist to the real endpoint.
+
+    python -m benchmarks.assignment --tasks 200 --users 50 --concurrency 4
+
+SQLite allows one writer at a time and reports "database is locked" under
+heavier write concurrency; point DATABASE_URL at Postgres to go higher.
+"""
+import argparse
+import asyncio
+import itertools
+import time
+from fastapi import Depends, HTTPException
+from sqlalchemy import event, insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from auth import require_permission
+from benchmarks.common import make_client, register_admin, reset_db, summarize
+from database import engine, get_db
+from jobs import enqueue
+from main import app
+from models import Task, TaskAssignment, User
+
+statements = 0
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    global statements
+    statements += 1
+
+
+async def legacy_assign_task(task_id: int, user_id: int, current_user: User = Depends(require_permission("tasks:assign")), db: AsyncSession = Depends(get_db)):
+    task = (await db.execute(select(Task).where(Task.id == task_id))).scalar_one_or_none()
+    user = (await db.execute(select(User).where(User.id == user_id))).scalar_one_or_none()
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found.")
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found.")
+    task_assignment = TaskAssignment(user_id=user_id, task_id=task_id)
+    db.add(task_assignment)
+    try:
+        await db.flush()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Task already assigned to this user.")
+    await enqueue(db, "task_assigned", {"assignment_ids": [task_assignment.id], "assigned_by": current_user.id})
+    await db.commit()
+    return {"task_assignment_id": task_assignment.id}
+
+
+app.add_api_route("/bench/legacy-assign-task", legacy_assign_task, methods=["POST"])
+
+
+async def run(client, url: str, pairs, concurrency: int, headers: dict) -> dict:
+    global statements
+    latencies = []
+    failures = 0
+
+    async def worker():
+        nonlocal failures
+        for task_id, user_id in pairs:
+            start = time.perf_counter()
+            response = await client.post(url, params={"task_id": task_id, "user_id": user_id}, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            failures += response.status_code != 200
+
+    statements = 0
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result = summarize(latencies, time.perf_counter() - start)
+    result["sql_per_request"] = round(statements / len(latencies), 2)
+    result["failures"] = failures
+    return result
+
+
+async def main(args):
+    await reset_db()
+    async with make_client() as client:
+        headers = await register_admin(client)
+        async with engine.begin() as conn:
+            await conn.execute(insert(Task), [{"title": f"task {i}"} for i in range(args.tasks)])
+            await conn.execute(insert(User), [{"username": f"user{i}", "hashed_password": "x"} for i in range(args.users)])
+
+        # User 1 is the admin; split the remaining pairs between the two runs
+        pairs = list(itertools.product(range(1, args.tasks + 1), range(2, args.users + 2)))
+        half = len(pairs) // 2
+        runs = [
+            ("before", "/bench/legacy-assign-task", pairs[:half]),
+            ("after", "/admin/assign-task", pairs[half:]),
+            ("repeat", "/admin/assign-task", pairs[half:]),
+        ]
+        for name, url, subset in runs:
+            result = await run(client, url, iter(subset), args.concurrency, headers)
+            print(f"{name:<7} {result}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    asyncio.run(main(parser.parse_args()))
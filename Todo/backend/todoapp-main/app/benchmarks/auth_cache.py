@@ -0,0 +1,41 @@
+"""Compares /admin/getTasks throughput with the principal cache off, on, and in
+trusted-claims mode.
+
+    python -m benchmarks.auth_cache --requests 2000
+"""
+import argparse
+import asyncio
+import os
+
+# Cached responses would hide the per-request principal lookup being compared
+os.environ.setdefault("CACHE_BACKEND", "none")
+
+import auth
+from benchmarks.common import drive, make_client, register_admin, reset_db
+
+
+async def main(args):
+    await reset_db()
+    async with make_client() as client:
+        headers = await register_admin(client)
+        for i in range(args.tasks):
+            await client.post("/admin/createTask", json={"title": f"task {i}"}, headers=headers)
+
+        modes = [
+            ("cache off", auth.PrincipalCache(max_size=0), False),
+            ("cache on", auth.PrincipalCache(), False),
+            ("trust claims", auth.PrincipalCache(max_size=0), True),
+        ]
+        for name, cache, trust in modes:
+            auth.principal_cache = cache
+            auth.AUTH_TRUST_CLAIMS = trust
+            result = await drive(client, "GET", "/admin/getTasks", args.requests, args.concurrency, headers=headers)
+            print(f"{name:<13} {result}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--tasks", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
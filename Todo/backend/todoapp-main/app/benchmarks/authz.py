@@ -0,0 +1,69 @@
+"""Measures what require_permission adds on top of authentication.
+
+Calls the auth dependencies directly, so the numbers exclude routing and
+serialization, and reports time and SQL statements per call for:
+authentication alone, authentication plus a permission check with a warm
+cache, and the same check with the permission cache cleared every call.
+
+    python -m benchmarks.authz --calls 20000 --max-overhead-us 50
+
+Exits non-zero when the warm check costs more than ``--max-overhead-us``
+over authentication or issues any SQL.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from sqlalchemy import event
+import auth
+from benchmarks.common import make_client, register_admin, reset_db
+from database import async_session, engine
+
+statements = 0
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    global statements
+    statements += 1
+
+
+async def measure(name: str, call, calls: int, before=None) -> float:
+    global statements
+    await call()  # warm the caches
+    statements = 0
+    start = time.perf_counter()
+    for _ in range(calls):
+        if before is not None:
+            before()
+        await call()
+    per_call = (time.perf_counter() - start) / calls * 1e6
+    print(f"{name:<28} {per_call:>8.1f} us/call {statements / calls:>6.2f} SQL/call")
+    return per_call
+
+
+async def main(args):
+    await reset_db()
+    async with make_client() as client:
+        headers = await register_admin(client)
+    token = headers["Authorization"].removeprefix("Bearer ")
+    check = auth.require_permission("tasks:read_all")
+
+    async with async_session() as db:
+        authn = await measure("authentication", lambda: auth.get_current_user(token, db), args.calls)
+        authz = await measure("authentication + permission", lambda: check(token, db), args.calls)
+        warm_statements = statements
+        await measure("permission, cold cache", lambda: check(token, db), args.calls, before=auth.permission_cache.clear)
+
+    overhead = authz - authn
+    print(f"authorization overhead: {overhead:.1f} us/call")
+    if overhead > args.max_overhead_us or warm_statements:
+        print(f"FAIL: limit is {args.max_overhead_us} us and no SQL per call")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--max-overhead-us", type=float, default=50.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+
+# The app reads DATABASE_URL at import time, so this has to run before any
+# app module is imported.
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///./bench.db")
+# Every benchmark request comes from one client address
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import httpx
+from sqlmodel import SQLModel
+from database import engine, init_db
+from main import app
+
+
+async def reset_db():
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.drop_all)
+    await init_db()
+
+
+def make_client() -> httpx.AsyncClient:
+    transport = httpx.ASGITransport(app=app)
+    return httpx.AsyncClient(transport=transport, base_url="http://bench")
+
+
+async def register_admin(client: httpx.AsyncClient, username: str = "admin", password: str = "admin") -> dict:
+    response = await client.post("/auth/register", json={"username": username, "password": password, "is_admin": True})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def percentile(values, p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def summarize(latencies, elapsed: float) -> dict:
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+async def drive(client: httpx.AsyncClient, method: str, url: str, total: int, concurrency: int, **kwargs) -> dict:
+    latencies = []
+    counter = iter(range(total))
+
+    async def worker():
+        for _ in counter:
+            start = time.perf_counter()
+            await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start)
@@ -0,0 +1,107 @@
+"""Measures the event feed with many idle subscribers.
+
+Opens ``--subscribers`` subscriptions spread over ``--users`` users, each with
+a consumer task shaped like the /events stream loop, then reports memory per
+subscriber, pooled database connections in use, the dispatch rate for
+targeted and all-users events, and commit-to-delivery latency for tasks
+created through the API.
+
+    python -m benchmarks.events --subscribers 10000 --events 20000
+"""
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+from benchmarks.common import make_client, percentile, register_admin, reset_db
+from broker import broker, task_event
+from database import pool_metrics
+from routers.events import EVENTS_HEARTBEAT_SECONDS
+
+
+def latency_summary(latencies) -> str:
+    return (
+        f"p50 {percentile(latencies, 0.50) * 1000:.2f} ms, p99 {percentile(latencies, 0.99) * 1000:.2f} ms, "
+        f"max {max(latencies, default=0) * 1000:.2f} ms"
+    )
+
+
+async def main(args):
+    random.seed(1)
+    received = []
+
+    async def consume(subscription):
+        while True:
+            try:
+                kind, data = await asyncio.wait_for(subscription.queue.get(), EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                continue
+            received.append((time.perf_counter(), data))
+
+    async def drain():
+        # Batches no larger than a subscriber queue never drop, so this ends
+        while len(received) < broker.delivered:
+            await asyncio.sleep(0)
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    subscriptions = [broker.subscribe(i % args.users + 1) for i in range(args.subscribers)]
+    subscriptions += [broker.subscribe(0, all_users=True) for _ in range(args.all_users)]
+    consumers = [asyncio.create_task(consume(subscription)) for subscription in subscriptions]
+    await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print(f"{len(subscriptions)} subscribers opened in {elapsed * 1000:.0f} ms, {used / len(subscriptions):.0f} bytes each")
+    print(f"pooled DB connections checked out while idle: {pool_metrics().get('checkedout', 0)}")
+
+    for name, user_ids in (("targeted", lambda: [random.randrange(args.users) + 1]), ("admins only", lambda: [])):
+        received.clear()
+        broker.delivered = 0
+        dropped = sum(subscription.dropped for subscription in subscriptions)
+        start = time.perf_counter()
+        for i in range(args.events):
+            broker.dispatch(task_event("task.updated", {"id": i}, user_ids()))
+            if i % args.batch == args.batch - 1:
+                await drain()
+        await drain()
+        elapsed = time.perf_counter() - start
+        dropped = sum(subscription.dropped for subscription in subscriptions) - dropped
+        print(
+            f"{name:<12} {args.events / elapsed:>9,.0f} events/s, {len(received) / elapsed:>10,.0f} deliveries/s,"
+            f" {len(received)} delivered, {dropped} dropped"
+        )
+
+    await reset_db()
+    async with make_client() as client:
+        headers = await register_admin(client)
+        received.clear()
+        sent = {}
+        for i in range(args.requests):
+            start = time.perf_counter()
+            response = await client.post("/admin/createTask", json={"title": f"event task {i}"}, headers=headers)
+            sent[response.json()["task_id"]] = start
+        await asyncio.sleep(0.1)
+    latencies = []
+    for delivered_at, data in received:
+        task_id = int(data.split(b'"id":')[1].split(b",")[0])
+        latencies.append(delivered_at - sent[task_id])
+    print(f"request to delivery ({args.all_users} all-users subscribers): {latency_summary(latencies)}")
+
+    for consumer in consumers:
+        consumer.cancel()
+    await asyncio.gather(*consumers, return_exceptions=True)
+    for subscription in subscriptions:
+        broker.unsubscribe(subscription)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--all-users", type=int, default=10, help="admin subscribers that receive every event")
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=100, help="events dispatched before waiting for delivery; at most EVENTS_QUEUE_SIZE")
+    parser.add_argument("--requests", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,202 @@
+"""Mixed-workload benchmark for the whole app.
+
+Seeds users, tasks and assignments, then drives a weighted mix of login, list,
+get, assign and per-user task reads through main.app in-process and reports
+throughput, latency percentiles and SQL statements per request for each
+operation.
+
+    python -m benchmarks.harness --tasks 10000 --requests 5000 --output run.json
+    python -m benchmarks.harness --baseline run.json --max-regression 0.15
+
+With ``--baseline`` the run exits non-zero when any operation's p95 latency or
+SQL statement count grows, or its throughput drops, by more than the allowed
+fraction.
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from sqlalchemy import event, insert
+from benchmarks.common import make_client, reset_db, summarize
+from database import engine
+from hashing import hasher
+from models import Role, Task, TaskAssignment, User, UserRoleLink
+from pagination import encode_cursor
+
+PASSWORD = "bench-password"
+SEED_CHUNK = 5000
+WORDS = ["report", "invoice", "deploy", "review", "migrate", "backup", "audit", "release", "design", "support"]
+
+current_operation = contextvars.ContextVar("current_operation", default=None)
+statement_counts = defaultdict(int)
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    operation = current_operation.get()
+    if operation is not None:
+        statement_counts[operation] += 1
+
+
+async def seed(users: int, tasks: int, assignments: int):
+    assignments = min(assignments, users * tasks)
+    hashed_password = await hasher.hash(PASSWORD)
+    async with engine.begin() as conn:
+        for start in range(0, users, SEED_CHUNK):
+            await conn.execute(insert(User), [
+                {"username": f"user{i}", "hashed_password": hashed_password}
+                for i in range(start, min(users, start + SEED_CHUNK))
+            ])
+        # user0 drives the admin endpoints
+        await conn.execute(insert(Role), [{"id": 1, "name": "admin"}, {"id": 2, "name": "user"}])
+        await conn.execute(insert(UserRoleLink), [{"user_id": 1, "role_id": 1}])
+        for start in range(0, tasks, SEED_CHUNK):
+            await conn.execute(insert(Task), [
+                {"title": f"{WORDS[i % len(WORDS)]} task {i}", "description": f"benchmark task number {i}"}
+                for i in range(start, min(tasks, start + SEED_CHUNK))
+            ])
+        for start in range(0, assignments, SEED_CHUNK):
+            await conn.execute(insert(TaskAssignment), [
+                {"task_id": i % tasks + 1, "user_id": (i // tasks) % users + 1, "status": "pending"}
+                for i in range(start, min(assignments, start + SEED_CHUNK))
+            ])
+
+
+def operations(args, headers):
+    def login():
+        return "POST", "/auth/token", {"json": {"username": f"user{random.randrange(args.users)}", "password": PASSWORD}}
+
+    def list_tasks():
+        return "GET", "/admin/getTasks", {"params": {"cursor": encode_cursor("id", random.randrange(args.tasks)), "limit": 50}, "headers": headers}
+
+    def get_task():
+        return "GET", f"/task/{random.randrange(args.tasks) + 1}", {"headers": headers}
+
+    def assign():
+        params = {"task_id": random.randrange(args.tasks) + 1, "user_id": random.randrange(args.users) + 1}
+        return "POST", "/admin/assign-task", {"params": params, "headers": headers}
+
+    def user_tasks():
+        return "GET", f"/user/tasks/{random.randrange(args.users) + 1}", {"headers": headers}
+
+    return {"login": login, "list": list_tasks, "get": get_task, "assign": assign, "user_tasks": user_tasks}
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, weight = part.split("=")
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+async def run(args) -> dict:
+    random.seed(args.seed)
+    await reset_db()
+    await seed(args.users, args.tasks, args.assignments)
+
+    async with make_client() as client:
+        response = await client.post("/auth/token", json={"username": "user0", "password": PASSWORD})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        ops = operations(args, headers)
+        weights = parse_mix(args.mix)
+        names = list(weights)
+        schedule = random.choices(names, weights=[weights[name] for name in names], k=args.requests)
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        queue = iter(schedule)
+
+        async def worker():
+            for name in queue:
+                method, url, kwargs = ops[name]()
+                token = current_operation.set(name)
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, url, **kwargs)
+                finally:
+                    current_operation.reset(token)
+                latencies[name].append(time.perf_counter() - start)
+                if response.status_code >= 500:
+                    errors[name] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+    results = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "total": summarize([value for values in latencies.values() for value in values], elapsed),
+        "operations": {},
+    }
+    for name, values in sorted(latencies.items()):
+        summary = summarize(values, elapsed)
+        summary["errors"] = errors[name]
+        summary["sql_per_request"] = round(statement_counts[name] / len(values), 2)
+        results["operations"][name] = summary
+    return results
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list:
+    regressions = []
+    for name, current in results["operations"].items():
+        previous = baseline["operations"].get(name)
+        if previous is None:
+            continue
+        if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + max_regression):
+            regressions.append(f"{name}: p95 {previous['p95_ms']} ms -> {current['p95_ms']} ms")
+        if current["rps"] < previous["rps"] * (1 - max_regression):
+            regressions.append(f"{name}: throughput {previous['rps']} -> {current['rps']} req/s")
+        if current["sql_per_request"] > previous["sql_per_request"]:
+            regressions.append(f"{name}: SQL/request {previous['sql_per_request']} -> {current['sql_per_request']}")
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{name}: errors {previous['errors']} -> {current['errors']}")
+    return regressions
+
+
+def print_report(results: dict):
+    print(f"{'operation':<11} {'requests':>8} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'sql/req':>8} {'errors':>6}")
+    rows = list(results["operations"].items()) + [("total", results["total"])]
+    for name, row in rows:
+        print(
+            f"{name:<11} {row['requests']:>8} {row['rps']:>8} {row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8}"
+            f" {row.get('sql_per_request', ''):>8} {row.get('errors', ''):>6}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--tasks", type=int, default=5000)
+    parser.add_argument("--assignments", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--mix", default="login=1,list=4,get=10,assign=2,user_tasks=3")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.10)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
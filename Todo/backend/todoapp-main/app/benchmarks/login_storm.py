@@ -0,0 +1,45 @@
+"""Measures GET /task/{task_id} latency while a burst of logins is running.
+
+    python -m benchmarks.login_storm --logins 200 --reads 2000
+
+With bcrypt on the event loop the p99 of the reads grows by the cost of every
+hash queued in front of them; with the hashing pool it should stay flat.
+"""
+import argparse
+import asyncio
+import os
+
+# Cached responses would take the reads off the database and the pool
+os.environ.setdefault("CACHE_BACKEND", "none")
+
+from benchmarks.common import drive, make_client, register_admin, reset_db
+from hashing import hasher
+
+
+async def main(args):
+    await reset_db()
+    async with make_client() as client:
+        headers = await register_admin(client)
+        await client.post("/admin/createTask", json={"title": "bench"}, headers=headers)
+
+        idle = await drive(client, "GET", "/task/1", args.reads, args.concurrency, headers=headers)
+
+        storm = asyncio.create_task(
+            drive(client, "POST", "/auth/token", args.logins, args.login_concurrency, json={"username": "admin", "password": "admin"})
+        )
+        loaded = await drive(client, "GET", "/task/1", args.reads, args.concurrency, headers=headers)
+        logins = await storm
+
+    print(f"hash pool: {hasher.metrics()}")
+    print(f"reads, idle:         {idle}")
+    print(f"reads, login storm:  {loaded}")
+    print(f"logins:              {logins}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--login-concurrency", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,58 @@
+"""Drives GET /task/{task_id} with 200 concurrent clients under two engine
+configurations and prints throughput and pool metrics for each.
+
+    DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.pool
+
+The "legacy" run reproduces the old engine (statement echo on, SQLAlchemy's
+default 5 + 10 pool); "tuned" uses whatever DB_* settings are in the
+environment.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+# Cached responses would skip the database these runs are measuring
+os.environ.setdefault("CACHE_BACKEND", "none")
+
+CONFIGS = {
+    "legacy": {"DB_ECHO": "true", "DB_POOL_SIZE": "5", "DB_MAX_OVERFLOW": "10", "DB_POOL_PRE_PING": "false"},
+    "tuned": {},
+}
+
+
+async def run_single(args):
+    from benchmarks.common import drive, make_client, register_admin, reset_db
+    from database import pool_metrics
+
+    await reset_db()
+    async with make_client() as client:
+        headers = await register_admin(client)
+        await client.post("/admin/createTask", json={"title": "bench"}, headers=headers)
+        result = await drive(client, "GET", "/task/1", args.requests, args.concurrency, headers=headers)
+    result["pool"] = pool_metrics()
+    print(json.dumps(result))
+
+
+def main(args):
+    for name, overrides in CONFIGS.items():
+        env = {**os.environ, **overrides}
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.pool", "--single", "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        print(f"{name:<7} {output.strip().splitlines()[-1]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.single:
+        asyncio.run(run_single(args))
+    else:
+        main(args)
@@ -0,0 +1,60 @@
+"""Measures the admission decision: time per call for admitted and rejected
+requests, with ``--ips`` distinct client addresses so the bucket store is
+sized like a busy server, then the share of a login storm from one address
+that gets through.
+
+    python -m benchmarks.ratelimit --calls 200000 --ips 50000 --max-decision-us 20
+
+Exits non-zero when an admitted decision costs more than ``--max-decision-us``.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from benchmarks.common import make_client, reset_db
+from ratelimit import Admission, MemoryStore, Rate, RateLimiter, rate_limiter
+
+
+async def measure(name: str, call, calls: int, ips: int) -> float:
+    start = time.perf_counter()
+    for i in range(calls):
+        await call(f"10.{i % ips >> 16 & 255}.{i % ips >> 8 & 255}.{i % ips & 255}")
+    per_call = (time.perf_counter() - start) / calls * 1e6
+    print(f"{name:<24} {per_call:>6.2f} us/decision")
+    return per_call
+
+
+async def main(args):
+    limiter = RateLimiter(store=MemoryStore(), enabled=True)
+    control = Admission(limiter, {"auth": 64})
+    limiter.ip_rates = {"auth": Rate(10**9, 1)}
+    admitted = await measure("admitted", lambda ip: control.reject("auth", ip), args.calls, args.ips)
+
+    limiter.ip_rates = {"auth": Rate(1, 3600)}
+    await measure("rate limited (429)", lambda ip: control.reject("auth", ip), args.calls, args.ips)
+
+    limiter.ip_rates = {}
+    control.in_flight["auth"] = control.limits["auth"]
+    await measure("over concurrency (503)", lambda ip: control.reject("auth", ip), args.calls, args.ips)
+
+    await reset_db()
+    rate_limiter.enabled = True
+    async with make_client() as client:
+        statuses = {}
+        for i in range(args.logins):
+            response = await client.post("/auth/token", json={"username": f"user{i}", "password": "wrong"})
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    print(f"{args.logins} logins from one address: {dict(sorted(statuses.items()))}")
+
+    if admitted > args.max_decision_us:
+        print(f"FAIL: limit is {args.max_decision_us} us per admitted decision")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--ips", type=int, default=50000)
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--max-decision-us", type=float, default=20.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,57 @@
+"""Latency of /task/search on a large task table.
+
+    DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.search --tasks 1000000
+
+Seeding goes straight through the engine; the queries go through the app so
+the numbers include auth and serialization. Run against Postgres with the
+migrations applied to measure the GIN index; SQLite uses the substring
+fallback and will be much slower on text queries.
+"""
+import argparse
+import asyncio
+import random
+import time
+from benchmarks.common import make_client, percentile, reset_db
+from benchmarks.harness import PASSWORD, WORDS, seed
+
+QUERIES = {
+    "text": lambda: {"q": random.choice(WORDS)},
+    "text + sort by title": lambda: {"q": random.choice(WORDS), "sort": "-title"},
+    "assignee": lambda: {"assignee": random.randrange(1, 1000)},
+    "text + status": lambda: {"q": random.choice(WORDS), "status": "pending"},
+    "id keyset page": lambda: {"cursor": None},
+}
+
+
+async def main(args):
+    random.seed(args.seed)
+    await reset_db()
+    await seed(args.users, args.tasks, args.assignments)
+
+    async with make_client() as client:
+        response = await client.post("/auth/token", json={"username": "user0", "password": PASSWORD})
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        for name, make_params in QUERIES.items():
+            latencies = []
+            for _ in range(args.queries):
+                params = {key: value for key, value in make_params().items() if value is not None}
+                start = time.perf_counter()
+                response = await client.get("/task/search", params=params, headers=headers)
+                latencies.append(time.perf_counter() - start)
+                response.raise_for_status()
+            print(
+                f"{name:<22} p50 {percentile(latencies, 0.50) * 1000:7.2f} ms"
+                f"  p95 {percentile(latencies, 0.95) * 1000:7.2f} ms"
+                f"  p99 {percentile(latencies, 0.99) * 1000:7.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--assignments", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,241 @@
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from database import engine
+from responses import dumps
+
+EVENTS_BROKER = os.getenv("EVENTS_BROKER", "auto")  # "auto", "postgres" or "memory"
+EVENTS_CHANNEL = os.getenv("EVENTS_CHANNEL", "task_events")
+# Events buffered per subscriber; a slow client loses the oldest ones
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+EVENTS_RECONNECT_SECONDS = float(os.getenv("EVENTS_RECONNECT_SECONDS", "1.0"))
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_MAX_BYTES = 7900
+
+logger = logging.getLogger("events")
+
+
+def task_event(kind: str, data: dict, user_ids: Iterable[int] = ()) -> dict:
+    """A change event; ``user_ids`` picks the subscribers who see it and is not sent to clients."""
+    return {"type": kind, "data": data, "user_ids": list(user_ids)}
+
+
+class Subscription:
+    __slots__ = ("user_id", "all_users", "queue", "dropped")
+
+    def __init__(self, user_id: int, all_users: bool, queue_size: int):
+        self.user_id = user_id
+        self.all_users = all_users
+        self.queue = asyncio.Queue(queue_size)
+        self.dropped = 0
+
+    def offer(self, item: tuple):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(item)
+
+
+class Broker:
+    """Fans change events out to the subscribers in this process.
+
+    Events published in a transaction are held on the session and delivered
+    only once it commits. Subscribers are indexed by user, so an event costs
+    time for the users it targets and the all-users subscribers, not for
+    every open connection.
+    """
+
+    name = "memory"
+
+    def __init__(self, queue_size: int = EVENTS_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._by_user: Dict[int, Set[Subscription]] = defaultdict(set)
+        self._all_users: Set[Subscription] = set()
+        self.published = 0
+        self.delivered = 0
+
+    def subscribe(self, user_id: int, all_users: bool = False) -> Subscription:
+        subscription = Subscription(user_id, all_users, self.queue_size)
+        if all_users:
+            self._all_users.add(subscription)
+        else:
+            self._by_user[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        if subscription.all_users:
+            self._all_users.discard(subscription)
+            return
+        subscribers = self._by_user.get(subscription.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._by_user[subscription.user_id]
+
+    def dispatch(self, event: dict):
+        item = (event["type"], dumps(event["data"]))
+        self.published += 1
+        # Parts after the first of a split event only add recipients
+        if not event.get("continued"):
+            for subscription in self._all_users:
+                subscription.offer(item)
+                self.delivered += 1
+        for user_id in set(event["user_ids"]):
+            for subscription in self._by_user.get(user_id, ()):
+                subscription.offer(item)
+                self.delivered += 1
+
+    async def publish(self, db: AsyncSession, *events: dict):
+        db.sync_session.info.setdefault("pending_events", []).extend(events)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def metrics(self) -> dict:
+        subscribers = [s for group in self._by_user.values() for s in group] + list(self._all_users)
+        return {
+            "broker": self.name,
+            "subscribers": len(subscribers),
+            "all_users_subscribers": len(self._all_users),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": sum(s.dropped for s in subscribers),
+        }
+
+
+class PostgresBroker(Broker):
+    """Shares events between workers with LISTEN/NOTIFY.
+
+    ``pg_notify`` runs inside the publishing transaction, so Postgres only
+    sends it on commit. Each process keeps one dedicated listener connection,
+    outside the pool, no matter how many clients are subscribed. Events sent
+    while that connection is down are lost; clients should refetch after
+    they reconnect.
+    """
+
+    name = "postgres"
+
+    def __init__(self, dsn: str, channel: str = EVENTS_CHANNEL, queue_size: int = EVENTS_QUEUE_SIZE):
+        super().__init__(queue_size)
+        self.dsn = dsn
+        self.channel = channel
+        self._task: Optional[asyncio.Task] = None
+
+    async def publish(self, db: AsyncSession, *events: dict):
+        for payload in self._payloads(events):
+            await db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": self.channel, "payload": payload})
+
+    @staticmethod
+    def _split(change: dict) -> List[str]:
+        """``change`` encoded, as several events sharing out its ``user_ids`` when one would not fit a NOTIFY."""
+        encoded = json.dumps(change, separators=(",", ":"))
+        if len(encoded) + 2 <= NOTIFY_MAX_BYTES:
+            return [encoded]
+        # Everything but the ids, counting the brackets of the batch around it
+        size = base = len(json.dumps({**change, "user_ids": [], "continued": True}, separators=(",", ":"))) + 2
+        if base >= NOTIFY_MAX_BYTES:
+            logger.warning("Dropping a %s event of %s bytes, too large for NOTIFY", change["type"], len(encoded))
+            return []
+        parts, ids = [], []
+        for user_id in change["user_ids"]:
+            width = len(str(user_id)) + 1
+            if ids and size + width > NOTIFY_MAX_BYTES:
+                parts.append(ids)
+                ids, size = [], base
+            ids.append(user_id)
+            size += width
+        parts.append(ids)
+        return [
+            json.dumps({**change, "user_ids": ids, **({"continued": True} if i else {})}, separators=(",", ":"))
+            for i, ids in enumerate(parts)
+        ]
+
+    @classmethod
+    def _payloads(cls, events) -> List[str]:
+        # Batch events into JSON arrays so bulk changes don't send one NOTIFY each
+        payloads, batch, size = [], [], 2
+        for change in events:
+            for encoded in cls._split(change):
+                if batch and size + len(encoded) + 1 > NOTIFY_MAX_BYTES:
+                    payloads.append("[" + ",".join(batch) + "]")
+                    batch, size = [], 2
+                batch.append(encoded)
+                size += len(encoded) + 1
+        if batch:
+            payloads.append("[" + ",".join(batch) + "]")
+        return payloads
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            events = json.loads(payload)
+        except ValueError:
+            logger.warning("Ignoring malformed notification on %s", channel)
+            return
+        for change in events:
+            self.dispatch(change)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen(), name="events-listener")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen(self):
+        import asyncpg
+
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _: closed.set())
+                await connection.add_listener(self.channel, self._on_notify)
+                await closed.wait()
+                logger.warning("Event listener connection closed, reconnecting")
+            except asyncio.CancelledError:
+                if connection is not None:
+                    await connection.close()
+                raise
+            except Exception:
+                logger.exception("Event listener failed, reconnecting")
+            await asyncio.sleep(EVENTS_RECONNECT_SECONDS)
+
+
+def make_broker(name: str = EVENTS_BROKER) -> Broker:
+    if name == "auto":
+        name = "postgres" if engine.dialect.name == "postgresql" else "memory"
+    if name == "memory":
+        return Broker()
+    if name == "postgres":
+        return PostgresBroker(engine.url.set(drivername="postgresql").render_as_string(hide_password=False))
+    raise ValueError(f"Unknown EVENTS_BROKER: {name!r}")
+
+
+broker = make_broker()
+
+
+@event.listens_for(Session, "after_commit")
+def _deliver_pending_events(session):
+    for pending in session.info.pop("pending_events", ()):
+        broker.dispatch(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_events(session):
+    session.info.pop("pending_events", None)
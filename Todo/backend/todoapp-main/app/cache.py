@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional, Tuple
+from fastapi import HTTPException, Request, Response
+from instrumentation import span
+from responses import dumps
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")  # "memory", "redis" or "none"
+CACHE_SIZE = int(os.getenv("CACHE_SIZE", "10000"))
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "300"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+_redis_client = None
+
+
+def redis_client():
+    """The process's one Redis client, created on first use; ``redis`` is an optional dependency."""
+    global _redis_client
+    if _redis_client is None:
+        import redis.asyncio as redis
+        _redis_client = redis.from_url(REDIS_URL)
+    return _redis_client
+
+
+class TTLCache:
+    """LRU mapping whose entries may also expire at a ``time.time()`` deadline.
+
+    ``max_size`` of 0 or less stores nothing.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, expires_at: Optional[float] = None):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def pop(self, key):
+        self._entries.pop(key, None)
+
+    def items(self) -> List[Tuple[object, object]]:
+        """A snapshot of ``(key, value)`` pairs, expired ones included, safe to pop from while iterating."""
+        return [(key, value) for key, (_, value) in self._entries.items()]
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class MemoryBackend:
+    """In-process LRU with per-entry expiry."""
+
+    def __init__(self, max_size: int = CACHE_SIZE):
+        self._entries = TTLCache(max_size)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._entries.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[int] = None):
+        self._entries.set(key, value, time.time() + ttl if ttl else None)
+
+    async def incr(self, key: str) -> int:
+        value = int(await self.get(key) or 0) + 1
+        await self.set(key, str(value).encode())
+        return value
+
+    async def delete(self, key: str):
+        self._entries.pop(key)
+
+
+class RedisBackend:
+    """Any server speaking the Redis protocol; ``client`` can be a fake in tests."""
+
+    def __init__(self, client=None):
+        self.client = client if client is not None else redis_client()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[int] = None):
+        await self.client.set(key, value, ex=ttl)
+
+    async def incr(self, key: str) -> int:
+        return await self.client.incr(key)
+
+    async def delete(self, key: str):
+        await self.client.delete(key)
+
+
+class ResponseCache:
+    """Caches serialized JSON responses per namespace.
+
+    A namespace is invalidated by bumping its generation counter, which
+    orphans every key written under the old generation; the LRU or Redis
+    expiry cleans them up.
+    """
+
+    def __init__(self, backend=None, ttl: int = CACHE_TTL_SECONDS):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    async def key(self, namespace: str, *parts) -> str:
+        generation = int(await self.backend.get(f"gen:{namespace}") or 0)
+        return ":".join([namespace, str(generation), *map(str, parts)])
+
+    async def get(self, key: str) -> Optional[Tuple[dict, bytes]]:
+        value = await self.backend.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        headers, body = value.split(b"\n", 1)
+        return json.loads(headers), body
+
+    async def set(self, key: str, body: bytes, headers: dict) -> dict:
+        headers = {"ETag": '"%s"' % hashlib.sha1(body).hexdigest(), **headers}
+        await self.backend.set(key, json.dumps(headers).encode() + b"\n" + body, self.ttl)
+        return headers
+
+    async def invalidate(self, namespace: str):
+        if self.backend is not None:
+            await self.backend.incr(f"gen:{namespace}")
+
+    def metrics(self) -> dict:
+        return {"backend": CACHE_BACKEND, "hits": self.hits, "misses": self.misses}
+
+
+def make_backend(name: str = CACHE_BACKEND):
+    if name == "memory":
+        return MemoryBackend()
+    if name == "redis":
+        return RedisBackend()
+    if name == "none":
+        return None
+    raise ValueError(f"Unknown CACHE_BACKEND: {name!r}")
+
+
+response_cache = ResponseCache(make_backend())
+
+
+def dump_json(data) -> bytes:
+    with span("serialize"):
+        return dumps(data)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    candidates = request.headers.get("if-none-match", "")
+    return any(candidate.strip().removeprefix("W/") in (etag, "*") for candidate in candidates.split(","))
+
+
+def version_etag(version: int) -> str:
+    return f'"v{version}"'
+
+
+def if_match_version(request: Request) -> Optional[int]:
+    """The row version the client's If-Match names; None when any version will do."""
+    header = request.headers.get("if-match")
+    if header is None or header.strip() == "*":
+        return None
+    tag = header.strip().removeprefix("W/")
+    if not (tag.startswith('"v') and tag.endswith('"') and tag[2:-1].isdigit()):
+        # Not an ETag this server handed out, so it can't match
+        raise HTTPException(status_code=412, detail="If-Match does not match the current version.")
+    return int(tag[2:-1])
+
+
+async def cached_json(request: Request, namespace: str, parts: tuple, load: Callable[[], Awaitable[Tuple[object, dict]]]) -> Response:
+    """Serves ``load()``'s ``(data, headers)`` from the cache, with ETag revalidation.
+
+    ``load`` may supply its own ETag; otherwise one is derived from the body.
+    """
+    if response_cache.backend is None:
+        data, headers = await load()
+        return Response(dump_json(data), media_type="application/json", headers=headers)
+
+    key = await response_cache.key(namespace, *parts)
+    entry = await response_cache.get(key)
+    if entry is None:
+        data, headers = await load()
+        body = dump_json(data)
+        headers = await response_cache.set(key, body, headers)
+    else:
+        headers, body = entry
+
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers={"ETag": headers["ETag"]})
+    return Response(body, media_type="application/json", headers=headers)
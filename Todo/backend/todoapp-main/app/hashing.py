@@ -0,0 +1,101 @@
+import asyncio
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from instrumentation import span
+
+# bcrypt releases the GIL, so threads give real parallelism; "process" is there
+# for hosts where the extension is built without that.
+HASH_POOL_KIND = os.getenv("HASH_POOL_KIND", "thread")
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", str(os.cpu_count() or 1)))
+HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", "64"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    """Runs bcrypt off the event loop with a bounded backlog."""
+
+    def __init__(self, kind: str = HASH_POOL_KIND, workers: int = HASH_POOL_WORKERS, queue_size: int = HASH_QUEUE_SIZE):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown HASH_POOL_KIND: {kind!r}")
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self._executor = None
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._latencies = deque(maxlen=1024)
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.workers + self.queue_size:
+            self._rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry shortly.",
+                headers={"Retry-After": "1"},
+            )
+        self._pending += 1
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            with span("bcrypt"):
+                return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._pending -= 1
+            self._completed += 1
+            self._latencies.append(time.perf_counter() - start)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(_verify, plain_password, hashed_password)
+
+    def metrics(self) -> dict:
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        return {
+            "pool_kind": self.kind,
+            "workers": self.workers,
+            "queue_capacity": self.queue_size,
+            "in_flight": min(self._pending, self.workers),
+            "queue_depth": max(0, self._pending - self.workers),
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "latency_p50_ms": round(percentile(0.50) * 1000, 2),
+            "latency_p99_ms": round(percentile(0.99) * 1000, 2),
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+hasher = PasswordHasher()
@@ -0,0 +1,219 @@
+import contextvars
+import cProfile
+import os
+import random
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+from database import env_bool
+
+INSTRUMENTATION_ENABLED = env_bool("INSTRUMENTATION", False)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+try:
+    from pyinstrument import Profiler  # optional, async-aware
+except ImportError:
+    Profiler = None
+
+
+class RequestStats:
+    __slots__ = ("spans", "sql_count", "sql_time")
+
+    def __init__(self):
+        self.spans = defaultdict(float)
+        self.sql_count = 0
+        self.sql_time = 0.0
+
+
+class RouteStats:
+    __slots__ = ("count", "duration", "buckets", "sql_count", "sql_time", "spans")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.spans = defaultdict(float)
+
+
+_current = contextvars.ContextVar("request_stats", default=None)
+route_stats = defaultdict(RouteStats)
+
+
+@contextmanager
+def span(name: str):
+    """Times a block into the current request's Server-Timing; a no-op when instrumentation is off."""
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.spans[name] += time.perf_counter() - start
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info["query_start"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.sql_count += 1
+        stats.sql_time += time.perf_counter() - start
+
+
+def route_template(scope) -> str:
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    # Depending on the FastAPI version, routes from an included router may
+    # report their path without the router prefix; recover it from the URL.
+    path = scope["path"]
+    prefix_depth = path.rstrip("/").count("/") - route.path.rstrip("/").count("/")
+    if prefix_depth <= 0 or path.startswith(route.path):
+        return route.path
+    return "/".join(path.split("/")[:prefix_depth + 1]) + route.path
+
+
+class InstrumentationMiddleware:
+    def __init__(self, app, sample_rate: float = PROFILE_SAMPLE_RATE, profile_dir: str = PROFILE_DIR):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.profile_dir = profile_dir
+        self.in_flight = 0
+        self._profiling = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                timings = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in stats.spans.items()]
+                timings.append(f'sql;dur={stats.sql_time * 1000:.2f};desc="{stats.sql_count} statements"')
+                timings.append(f"total;dur={(time.perf_counter() - start) * 1000:.2f}")
+                MutableHeaders(scope=message).append("Server-Timing", ", ".join(timings))
+            await send(message)
+
+        self.in_flight += 1
+        profiler = self._start_profiler()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            self.in_flight -= 1
+            duration = time.perf_counter() - start
+            _current.reset(token)
+            key = (scope["method"], route_template(scope), status_code)
+            self._record(route_stats[key], stats, duration)
+            if profiler is not None:
+                self._save_profile(profiler, scope)
+
+    @staticmethod
+    def _record(route: RouteStats, stats: RequestStats, duration: float):
+        route.count += 1
+        route.duration += duration
+        for i, bound in enumerate(BUCKETS):
+            if duration <= bound:
+                route.buckets[i] += 1
+        route.sql_count += stats.sql_count
+        route.sql_time += stats.sql_time
+        for name, seconds in stats.spans.items():
+            route.spans[name] += seconds
+
+    def _start_profiler(self):
+        """A started profiler for this request, or None when it isn't sampled.
+
+        Both profilers trace the whole thread, so only one request is sampled
+        at a time. cProfile can't tell tasks apart either, so it only samples
+        requests that have the event loop to themselves.
+        """
+        if self._profiling or not self.sample_rate or random.random() >= self.sample_rate:
+            return None
+        try:
+            if Profiler is not None:
+                profiler = Profiler(async_mode="enabled")
+                profiler.start()
+            elif self.in_flight > 1:
+                return None
+            else:
+                profiler = cProfile.Profile()
+                profiler.enable()
+        except (RuntimeError, ValueError):
+            # Another profiler, e.g. one wrapped around the whole server, is already active
+            return None
+        self._profiling = True
+        return profiler
+
+    def _save_profile(self, profiler, scope):
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{scope['method']}{scope['path'].replace('/', '_')}-{random.randrange(1 << 16):04x}"
+            if isinstance(profiler, cProfile.Profile):
+                profiler.disable()
+                profiler.dump_stats(os.path.join(self.profile_dir, f"{name}.prof"))
+            else:
+                profiler.stop()
+                with open(os.path.join(self.profile_dir, f"{name}.html"), "w") as f:
+                    f.write(profiler.output_html())
+        finally:
+            self._profiling = False
+
+
+def install(app, engine):
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    app.add_middleware(InstrumentationMiddleware)
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels.items()) + "}"
+
+
+def render_prometheus(gauges: dict) -> str:
+    """Route metrics plus ``gauges``, a ``{prefix: {name: number}}`` mapping, in Prometheus text format."""
+    lines = [
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (method, path, status), route in sorted(route_stats.items()):
+        labels = dict(method=method, route=path, status=status)
+        for bound, count in zip(BUCKETS, route.buckets):
+            lines.append(f"http_request_duration_seconds_bucket{_labels(**labels, le=bound)} {count}")
+        lines.append(f"http_request_duration_seconds_bucket{_labels(**labels, le='+Inf')} {route.count}")
+        lines.append(f"http_request_duration_seconds_sum{_labels(**labels)} {route.duration}")
+        lines.append(f"http_request_duration_seconds_count{_labels(**labels)} {route.count}")
+
+    lines.append("# TYPE http_request_sql_statements_total counter")
+    for (method, path, status), route in sorted(route_stats.items()):
+        lines.append(f"http_request_sql_statements_total{_labels(method=method, route=path, status=status)} {route.sql_count}")
+    lines.append("# TYPE http_request_sql_seconds_total counter")
+    for (method, path, status), route in sorted(route_stats.items()):
+        lines.append(f"http_request_sql_seconds_total{_labels(method=method, route=path, status=status)} {route.sql_time}")
+    lines.append("# TYPE http_request_span_seconds_total counter")
+    for (method, path, status), route in sorted(route_stats.items()):
+        for name, seconds in sorted(route.spans.items()):
+            lines.append(f"http_request_span_seconds_total{_labels(method=method, route=path, status=status, span=name)} {seconds}")
+
+    for prefix, values in gauges.items():
+        for name, value in values.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f"# TYPE {prefix}_{name} gauge")
+                lines.append(f"{prefix}_{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+from sqlalchemy import update
+from sqlmodel import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import async_session
+from models import Job, utcnow
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))  # 0 runs no workers in this process
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_BACKOFF_SECONDS = float(os.getenv("JOB_BACKOFF_SECONDS", "2.0"))
+JOB_MAX_BACKOFF_SECONDS = float(os.getenv("JOB_MAX_BACKOFF_SECONDS", "300"))
+# Jobs left "running" this long (e.g. by a crashed process) go back to the
+# queue; workers check twice per period and keep their own jobs fresh
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "600"))
+
+logger = logging.getLogger("jobs")
+
+handlers: Dict[str, Callable[[dict], Awaitable[Optional[dict]]]] = {}
+
+
+def job_handler(kind: str):
+    def register(fn):
+        handlers[kind] = fn
+        return fn
+    return register
+
+
+async def enqueue(db: AsyncSession, kind: str, payload: dict, max_attempts: int = JOB_MAX_ATTEMPTS, run_after: Optional[datetime] = None) -> Job:
+    """Adds a job to the caller's transaction; it becomes visible to workers on commit."""
+    if kind not in handlers:
+        raise ValueError(f"No handler registered for job kind {kind!r}")
+    job = Job(kind=kind, payload=json.dumps(payload), max_attempts=max_attempts, run_after=run_after or utcnow())
+    db.add(job)
+    await db.flush()
+    return job
+
+
+def backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(JOB_MAX_BACKOFF_SECONDS, JOB_BACKOFF_SECONDS * 2 ** (attempts - 1)))
+
+
+class JobQueue:
+    """Pool of asyncio workers pulling jobs from the ``job`` table.
+
+    Claims use ``FOR UPDATE SKIP LOCKED`` on Postgres so any number of
+    processes can share the table; the conditional update keeps SQLite, which
+    has no row locks, from running a job twice.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, poll_interval: float = JOB_POLL_INTERVAL, stale_seconds: float = JOB_STALE_SECONDS):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stale_seconds = stale_seconds
+        self._next_requeue = 0.0
+        self._tasks = []
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+    async def start(self):
+        if not self.workers or self._tasks:
+            return
+        self._stopping = False
+        await self._requeue_stale()
+        self._tasks = [asyncio.create_task(self._worker(), name=f"job-worker-{i}") for i in range(self.workers)]
+
+    def notify(self):
+        """Wakes idle workers after a commit instead of waiting for the next poll."""
+        self._wakeup.set()
+
+    async def stop(self, timeout: float = 30.0):
+        """Stops claiming new jobs and waits up to ``timeout`` for running ones to finish."""
+        self._stopping = True
+        self._wakeup.set()
+        if not self._tasks:
+            return
+        done, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        self._tasks = []
+
+    async def _worker(self):
+        while not self._stopping:
+            try:
+                if time.monotonic() >= self._next_requeue:
+                    await self._requeue_stale()
+                job = await self._claim()
+            except Exception:
+                logger.exception("Could not claim a job")
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._run(job)
+            except Exception:
+                # The outcome wasn't saved; the job is retried once it goes stale
+                logger.exception("Could not record the outcome of job %s", job.id)
+
+    async def _requeue_stale(self):
+        # Set before the query so the other workers skip this round
+        self._next_requeue = time.monotonic() + self.stale_seconds / 2
+        async with async_session() as session:
+            requeued = await session.execute(
+                update(Job)
+                .where(Job.status == "running", Job.updated_at < utcnow() - timedelta(seconds=self.stale_seconds))
+                .values(status="queued")
+            )
+            await session.commit()
+        if requeued.rowcount:
+            logger.warning("Requeued %s jobs that stopped making progress", requeued.rowcount)
+
+    async def _claim(self) -> Optional[Job]:
+        now = utcnow()
+        async with async_session() as session:
+            job = (await session.execute(
+                select(Job)
+                .where(Job.status == "queued", Job.run_after <= now)
+                .order_by(Job.run_after, Job.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )).scalar_one_or_none()
+            if job is None:
+                return None
+            claimed = await session.execute(
+                update(Job)
+                .where(Job.id == job.id, Job.status == "queued")
+                .values(status="running", attempts=Job.attempts + 1, updated_at=now)
+            )
+            await session.commit()
+            if claimed.rowcount != 1:
+                return None
+            job.attempts += 1
+            return job
+
+    async def _run(self, job: Job):
+        heartbeat = asyncio.create_task(self._heartbeat(job.id))
+        try:
+            result = await handlers[job.kind](json.loads(job.payload))
+            values = {"status": "done", "result": json.dumps(result), "last_error": None}
+        except Exception as exc:
+            logger.warning("Job %s (%s) failed on attempt %s: %r", job.id, job.kind, job.attempts, exc)
+            values = {"last_error": repr(exc)[:1000]}
+            if job.attempts >= job.max_attempts:
+                values["status"] = "failed"
+            else:
+                values.update(status="queued", run_after=utcnow() + backoff(job.attempts))
+        finally:
+            heartbeat.cancel()
+        async with async_session() as session:
+            await session.execute(update(Job).where(Job.id == job.id).values(updated_at=utcnow(), **values))
+            await session.commit()
+
+    async def _heartbeat(self, job_id: int):
+        """Keeps a running job's ``updated_at`` recent so it isn't taken for stale."""
+        while True:
+            await asyncio.sleep(self.stale_seconds / 3)
+            try:
+                async with async_session() as session:
+                    await session.execute(
+                        update(Job).where(Job.id == job_id, Job.status == "running").values(updated_at=utcnow())
+                    )
+                    await session.commit()
+            except Exception:
+                logger.exception("Could not refresh running job %s", job_id)
+
+
+job_queue = JobQueue()
+
+
+@job_handler("task_assigned")
+async def task_assigned(payload: dict) -> dict:
+    # Assignment notifications have no delivery channel yet; keep an audit trail
+    for assignment_id in payload["assignment_ids"]:
+        logger.info("audit: assignment %s created by user %s", assignment_id, payload["assigned_by"])
+    return {"notified": len(payload["assignment_ids"])}
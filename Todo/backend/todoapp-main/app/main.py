@@ -1,31 +1,79 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from database import get_db, init_db
-from routers import admin, user, task
+from fastapi.middleware.gzip import GZipMiddleware
+from database import engine, get_db, init_db, warm_pool
+from routers import admin, user, task, internal, job, events
+from hashing import hasher
+from jobs import job_queue
+from stats import start_reconciliation
+from revocation import denylist
+from broker import broker
+from instrumentation import INSTRUMENTATION_ENABLED, install as install_instrumentation
 from auth import router as auth_router
+from pagination import NEXT_CURSOR_HEADER
+from ratelimit import AdmissionMiddleware
+from responses import GZIP_MIN_SIZE, FastJSONResponse
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await init_db()
+    await warm_pool()
+    await denylist.start()
+    await broker.start()
+    await start_reconciliation()
+    await job_queue.start()
+    try:
+        yield
+    finally:
+        # The server has stopped accepting requests and finished in-flight ones by now
+        await job_queue.stop()
+        await broker.stop()
+        await denylist.stop()
+        hasher.shutdown()
+        await engine.dispose()
 
-app = FastAPI()
 
 origins = [
     "http://localhost:3000",  
   
 ]
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,  
-    allow_methods=["*"],  
-    allow_headers=["*"],  
-)
-
-@app.on_event("startup")
-async def startup():
- 
-    await init_db()
+
+def create_app() -> FastAPI:
+    app = FastAPI(default_response_class=FastJSONResponse, lifespan=lifespan)
+
+    # Innermost of the middleware, so 429 and 503 responses still get CORS headers and are measured
+    app.add_middleware(AdmissionMiddleware)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,  
+        allow_methods=["*"],  
+        allow_headers=["*"],  
+        # Pagination and If-Match need these readable from the browser
+        expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
+    )
+
+    try:
+        from brotli_asgi import BrotliMiddleware  # optional, falls back to gzip for other clients
+        app.add_middleware(BrotliMiddleware, minimum_size=GZIP_MIN_SIZE)
+    except ImportError:
+        app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE)
+
+    if INSTRUMENTATION_ENABLED:
+        install_instrumentation(app, engine)
+
+    app.include_router(auth_router, prefix="/auth", tags=["Auth"])  
+    app.include_router(admin.router, prefix="/admin", tags=["Admin"]) 
+    app.include_router(user.router, prefix="/user", tags=["User"])  
+    app.include_router(task.router, prefix="/task", tags=["Task"]) 
+    app.include_router(job.router, prefix="/jobs", tags=["Jobs"])
+    app.include_router(events.router, prefix="/events", tags=["Events"])
+    app.include_router(internal.router, prefix="/internal", tags=["Internal"], include_in_schema=False)
+    return app
 
 
-app.include_router(auth_router, prefix="/auth", tags=["Auth"])  
-app.include_router(admin.router, prefix="/admin", tags=["Admin"]) 
-app.include_router(user.router, prefix="/user", tags=["User"])  
-app.include_router(task.router, prefix="/task", tags=["Task"]) 
+app = create_app()
@@ -1,3 +1,5 @@
+from datetime import datetime, timezone
+from sqlalchemy import DateTime, Index, text
 from sqlmodel import SQLModel, Field, Relationship
 from typing import List, Optional
 
@@ -19,19 +21,73 @@ class Role(SQLModel, table=True):
 
     users: List["User"] = Relationship(back_populates="roles", link_model=UserRoleLink)
 
+# Task search queries must use this exact expression for Postgres to pick the GIN index
+TASK_SEARCH_VECTOR = "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, ''))"
+
 class Task(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_task_title_id", "title", "id"),
+        Index("ix_task_search", text(TASK_SEARCH_VECTOR), postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str = Field(nullable=False)
     description: Optional[str] = Field(default=None)
+    # Bumped by every update; clients send it back in If-Match
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
 
     assignments: List["TaskAssignment"] = Relationship(back_populates="task")
 
 class TaskAssignment(SQLModel, table=True):
+    # The unique (task_id, user_id) index also serves lookups by task_id alone
+    __table_args__ = (Index("uq_taskassignment_task_user", "task_id", "user_id", unique=True),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: Optional[int] = Field(default=None, foreign_key="user.id")
+    user_id: Optional[int] = Field(default=None, foreign_key="user.id", index=True)
     task_id: Optional[int] = Field(default=None, foreign_key="task.id")
-    status: str = Field(default="pending")
+    status: str = Field(default="pending", index=True)
 
     user: "User" = Relationship(back_populates="tasks")
     task: "Task" = Relationship(back_populates="assignments")
 
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+class Job(SQLModel, table=True):
+    # Workers claim the oldest due job in a given status
+    __table_args__ = (Index("ix_job_status_run_after", "status", "run_after"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str = Field(nullable=False)
+    payload: str = Field(default="{}")  # JSON
+    status: str = Field(default="queued")  # queued, running, done, failed
+    attempts: int = Field(default=0)
+    max_attempts: int = Field(default=5)
+    run_after: datetime = Field(default_factory=utcnow, sa_type=DateTime(timezone=True))
+    last_error: Optional[str] = Field(default=None)
+    result: Optional[str] = Field(default=None)  # JSON
+    created_at: datetime = Field(default_factory=utcnow, sa_type=DateTime(timezone=True))
+    updated_at: datetime = Field(default_factory=utcnow, sa_type=DateTime(timezone=True))
+
+class RefreshToken(SQLModel, table=True):
+    # One row per issued refresh token; tokens rotated from the same login share a family
+    jti: str = Field(primary_key=True)
+    family: str = Field(nullable=False, index=True)
+    user_id: int = Field(foreign_key="user.id", ondelete="CASCADE", index=True)
+    expires_at: datetime = Field(sa_type=DateTime(timezone=True), index=True)
+    rotated_at: Optional[datetime] = Field(default=None, sa_type=DateTime(timezone=True))
+    revoked: bool = Field(default=False)
+    created_at: datetime = Field(default_factory=utcnow, sa_type=DateTime(timezone=True))
+
+class RevokedToken(SQLModel, table=True):
+    # Access tokens revoked before their exp; rows are useless after expires_at
+    jti: str = Field(primary_key=True)
+    expires_at: datetime = Field(sa_type=DateTime(timezone=True), index=True)
+
+class AssignmentCount(SQLModel, table=True):
+    # Assignments per user or task and status, kept current by the routes that
+    # change assignments so /admin/stats never has to scan taskassignment
+    scope: str = Field(primary_key=True)  # "user" or "task"
+    key: int = Field(primary_key=True)
+    status: str = Field(primary_key=True)
+    count: int = Field(default=0)
@@ -0,0 +1,43 @@
+"""Keyset pagination shared by every paged list endpoint.
+
+A page answers with the opaque cursor for the next one in the
+``X-Next-Cursor`` header, left out on the last page; clients send it back
+unchanged as the ``cursor`` query parameter. The cursor names the sort it was
+issued under, so it can't be replayed against a different ordering.
+"""
+import base64
+import json
+from typing import Callable, Sequence, Tuple
+from fastapi import HTTPException
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+CURSOR_DESCRIPTION = "The X-Next-Cursor header of the previous page."
+
+
+def encode_cursor(sort: str, *values) -> str:
+    return base64.urlsafe_b64encode(json.dumps([sort, *values]).encode()).decode()
+
+
+def decode_cursor(cursor: str, sort: str, types: Tuple[type, ...] = (int,)) -> list:
+    """The position values stored in ``cursor``.
+
+    Answers 400 unless the cursor was issued for ``sort`` and its values have
+    ``types``, so nothing malformed reaches the query.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    if not isinstance(values, list) or len(values) != len(types) + 1 or values[0] != sort:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    for value, expected in zip(values[1:], types):
+        # bool is an int subclass but never a valid position
+        if not isinstance(value, expected) or isinstance(value, bool):
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+    return values[1:]
+
+
+def next_cursor_headers(rows: Sequence, limit: int, sort: str = "id", position: Callable = lambda row: (row.id,)) -> dict:
+    if len(rows) == limit:
+        return {NEXT_CURSOR_HEADER: encode_cursor(sort, *position(rows[-1]))}
+    return {}
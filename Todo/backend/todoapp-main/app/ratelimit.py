@@ -0,0 +1,208 @@
+import math
+import os
+import time
+from collections import OrderedDict, defaultdict
+from typing import NamedTuple, Optional
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from cache import redis_client
+from database import DB_MAX_OVERFLOW, DB_POOL_SIZE, env_bool
+
+RATE_LIMIT_ENABLED = env_bool("RATE_LIMIT_ENABLED", True)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # "memory" or "redis"
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+# "<requests>/<seconds>"; the whole allowance may be spent in one burst
+AUTH_RATE_LIMIT_IP = os.getenv("AUTH_RATE_LIMIT_IP", "30/60")
+AUTH_RATE_LIMIT_USERNAME = os.getenv("AUTH_RATE_LIMIT_USERNAME", "10/60")
+WRITE_RATE_LIMIT_IP = os.getenv("WRITE_RATE_LIMIT_IP", "600/60")
+# Requests in flight per route group before new ones get a 503; 0 is unlimited.
+# Writes default to what the pool can serve without waiting for a connection.
+ADMISSION_LIMITS = os.getenv("ADMISSION_LIMITS", f"auth=64,write={DB_POOL_SIZE + DB_MAX_OVERFLOW},read=0")
+
+# Routes that hash passwords, whatever their method
+AUTH_PATHS = ("/auth/token", "/auth/register", "/user/register", "/user/login")
+# Long-lived streams are never shed
+EXEMPT_PATHS = ("/events",)
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class Rate(NamedTuple):
+    limit: int
+    period: float
+
+    @classmethod
+    def parse(cls, value: str) -> Optional["Rate"]:
+        if not value or value == "0":
+            return None
+        limit, period = value.split("/")
+        return cls(int(limit), float(period))
+
+
+class MemoryStore:
+    """Token buckets in this process, stored GCRA-style as one timestamp per key.
+
+    The least recently used keys are dropped past ``max_keys``; a dropped
+    key simply starts again with a full bucket.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._tat = OrderedDict()  # key -> theoretical arrival time
+
+    async def take(self, key: str, rate: Rate) -> float:
+        """Spends one token; returns 0 when allowed, otherwise seconds until the next one."""
+        now = time.monotonic()
+        tat = max(self._tat.get(key, now), now) + rate.period / rate.limit
+        if tat - now > rate.period:
+            return tat - now - rate.period
+        self._tat[key] = tat
+        self._tat.move_to_end(key)
+        if len(self._tat) > self.max_keys:
+            self._tat.popitem(last=False)
+        return 0.0
+
+
+class RedisStore:
+    """The same buckets shared by every worker through Redis; ``client`` can be a fake in tests."""
+
+    SCRIPT = """
+    local now = redis.call('TIME')
+    now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+    local interval, period = tonumber(ARGV[1]), tonumber(ARGV[2])
+    local tat = math.max(tonumber(redis.call('GET', KEYS[1]) or now), now) + interval
+    if tat - now > period then
+        return tostring(tat - now - period)
+    end
+    redis.call('SET', KEYS[1], tostring(tat), 'PX', math.ceil(period * 1000))
+    return '0'
+    """
+
+    def __init__(self, client=None):
+        self.client = client if client is not None else redis_client()
+        self._script = self.client.register_script(self.SCRIPT)
+
+    async def take(self, key: str, rate: Rate) -> float:
+        return float(await self._script(keys=[f"ratelimit:{key}"], args=[rate.period / rate.limit, rate.period]))
+
+
+def make_store(name: str = RATE_LIMIT_BACKEND):
+    if name == "memory":
+        return MemoryStore()
+    if name == "redis":
+        return RedisStore()
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {name!r}")
+
+
+def parse_limits(value: str) -> dict:
+    limits = {}
+    for part in filter(None, value.split(",")):
+        group, limit = part.split("=")
+        limits[group.strip()] = int(limit)
+    return limits
+
+
+class RateLimiter:
+    def __init__(self, store=None, enabled: bool = RATE_LIMIT_ENABLED):
+        self.store = store if store is not None else make_store()
+        self.enabled = enabled
+        self.ip_rates = {"auth": Rate.parse(AUTH_RATE_LIMIT_IP), "write": Rate.parse(WRITE_RATE_LIMIT_IP)}
+        self.username_rate = Rate.parse(AUTH_RATE_LIMIT_USERNAME)
+        self.limited = defaultdict(int)
+
+    async def check_ip(self, group: str, ip: str) -> float:
+        rate = self.ip_rates.get(group)
+        if not self.enabled or rate is None:
+            return 0.0
+        retry_after = await self.store.take(f"ip:{group}:{ip}", rate)
+        if retry_after:
+            self.limited[f"ip_{group}"] += 1
+        return retry_after
+
+    async def check_username(self, username: str):
+        """Raises 429 once ``username`` has used up its login attempts, whichever IPs they came from."""
+        if not self.enabled or self.username_rate is None:
+            return
+        retry_after = await self.store.take(f"user:{username.lower()}", self.username_rate)
+        if retry_after:
+            self.limited["username"] += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Too many attempts for this account, please retry later.",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+
+rate_limiter = RateLimiter()
+
+
+def route_group(method: str, path: str) -> Optional[str]:
+    if path.startswith(EXEMPT_PATHS):
+        return None
+    if path.startswith(AUTH_PATHS):
+        return "auth"
+    return "read" if method in READ_METHODS else "write"
+
+
+class Admission:
+    """Per-IP rate limits and per-group concurrency limits, checked before routing.
+
+    Both checks are dictionary lookups and arithmetic, so a rejected request
+    costs microseconds and never reaches the database or the hash pool.
+    """
+
+    def __init__(self, limiter: RateLimiter = None, limits: dict = None):
+        self.limiter = limiter or rate_limiter
+        self.limits = parse_limits(ADMISSION_LIMITS) if limits is None else limits
+        self.in_flight = defaultdict(int)
+        self.shed = defaultdict(int)
+
+    async def reject(self, group: str, ip: str) -> Optional[JSONResponse]:
+        """The response to send instead of handling the request, or None to admit it."""
+        retry_after = await self.limiter.check_ip(group, ip)
+        if retry_after:
+            return JSONResponse(
+                {"detail": "Too many requests, please retry later."},
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+        limit = self.limits.get(group, 0)
+        if limit and self.in_flight[group] >= limit:
+            self.shed[group] += 1
+            return JSONResponse({"detail": "Server is busy, please retry shortly."}, status_code=503, headers={"Retry-After": "1"})
+        return None
+
+    def metrics(self) -> dict:
+        metrics = {f"in_flight_{group}": self.in_flight[group] for group in self.limits}
+        metrics.update({f"limit_{group}": limit for group, limit in self.limits.items()})
+        metrics.update({f"shed_{group}": count for group, count in self.shed.items()})
+        metrics.update({f"limited_{name}": count for name, count in self.limiter.limited.items()})
+        return metrics
+
+
+admission = Admission()
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, control: Admission = None):
+        self.app = app
+        self.control = control or admission
+
+    async def __call__(self, scope, receive, send):
+        group = route_group(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if group is None:
+            await self.app(scope, receive, send)
+            return
+
+        client = scope.get("client")
+        response = await self.control.reject(group, client[0] if client else "unknown")
+        if response is not None:
+            await response(scope, receive, send)
+            return
+
+        in_flight = self.control.in_flight
+        in_flight[group] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            in_flight[group] -= 1
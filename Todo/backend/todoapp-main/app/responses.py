@@ -0,0 +1,53 @@
+import json
+import os
+from typing import Any, List
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1024"))
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(data: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":"), default=str).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class RowSchema:
+    """Column projection checked against a response model once, at import time.
+
+    ``rows()`` then turns result tuples into plain dicts without building a
+    Pydantic object per row.
+    """
+
+    def __init__(self, model: type[BaseModel], *columns):
+        names = [column.key for column in columns]
+        if names != list(model.model_fields):
+            raise TypeError(f"{model.__name__} fields {list(model.model_fields)} do not match columns {names}")
+        for column, (name, field) in zip(columns, model.model_fields.items()):
+            nullable = getattr(getattr(column, "expression", column), "nullable", False)
+            if nullable and field.is_required() and not _allows_none(field.annotation):
+                raise TypeError(f"{model.__name__}.{name} is not Optional but column {column} is nullable")
+        self.model = model
+        self.columns = columns
+        self.names = tuple(names)
+
+    def rows(self, rows) -> List[dict]:
+        names = self.names
+        return [dict(zip(names, row)) for row in rows]
+
+
+def _allows_none(annotation) -> bool:
+    return annotation is None or type(None) in getattr(annotation, "__args__", ())
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+from database import async_session
+from models import RefreshToken, RevokedToken, utcnow
+
+# How stale another worker's view of a revocation may get
+DENYLIST_SYNC_SECONDS = float(os.getenv("DENYLIST_SYNC_SECONDS", "5"))
+DENYLIST_PURGE_SECONDS = float(os.getenv("DENYLIST_PURGE_SECONDS", "300"))
+
+logger = logging.getLogger("revocation")
+
+
+class Denylist:
+    """In-memory ``jti -> exp`` map of revoked access tokens.
+
+    Lookups never touch the database. Revocations made in this process apply
+    at once; the ``revokedtoken`` table is re-read every ``sync_interval``
+    seconds to pick up the ones made by other workers. Only tokens that have
+    not expired yet are kept, so the map stays as small as the revocations
+    of the last access-token lifetime.
+    """
+
+    def __init__(self, sync_interval: float = DENYLIST_SYNC_SECONDS, purge_interval: float = DENYLIST_PURGE_SECONDS):
+        self.sync_interval = sync_interval
+        self.purge_interval = purge_interval
+        self._entries: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._purged_at = 0.0
+        self._synced_at = 0.0
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        if jti is None:
+            return False
+        exp = self._entries.get(jti)
+        return exp is not None and exp > time.time()
+
+    async def revoke(self, db: AsyncSession, jti: str, exp: float):
+        """Adds the token to the caller's transaction; ``remember`` it once that commits."""
+        if jti in self._entries:
+            return
+        await db.merge(RevokedToken(jti=jti, expires_at=datetime.fromtimestamp(exp, timezone.utc)))
+
+    def remember(self, jti: str, exp: float):
+        """Applies a committed revocation in this process without waiting for the next sync."""
+        self._entries[jti] = exp
+
+    async def sync(self):
+        now = time.time()
+        async with async_session() as session:
+            rows = (await session.execute(
+                select(RevokedToken.jti, RevokedToken.expires_at).where(RevokedToken.expires_at > utcnow())
+            )).all()
+            if now - self._purged_at >= self.purge_interval:
+                await self._purge(session)
+                self._purged_at = now
+        # Merge rather than replace, so a revocation committed after the
+        # SELECT above is not dropped until the next sync.
+        entries = {jti: exp for jti, exp in self._entries.items() if exp > now}
+        # SQLite hands back naive datetimes, which are UTC here
+        entries.update(
+            (jti, (expires_at if expires_at.tzinfo else expires_at.replace(tzinfo=timezone.utc)).timestamp())
+            for jti, expires_at in rows
+        )
+        self._entries = entries
+        self._synced_at = now
+
+    @staticmethod
+    async def _purge(session: AsyncSession):
+        now = utcnow()
+        await session.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+        await session.execute(delete(RefreshToken).where(RefreshToken.expires_at <= now))
+        await session.commit()
+
+    async def start(self):
+        if self._task is not None:
+            return
+        await self.sync()
+        self._task = asyncio.create_task(self._run(), name="denylist-sync")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except Exception:
+                logger.exception("Could not sync the token denylist")
+
+    def metrics(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "sync_interval_seconds": self.sync_interval,
+            "seconds_since_sync": round(time.time() - self._synced_at, 3) if self._synced_at else -1,
+        }
+
+
+denylist = Denylist()
@@ -1,10 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, insert, literal, tuple_, union_all, update
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 from models import User, Task, TaskAssignment
-from database import get_db
-from auth import get_current_user 
-from pydantic import BaseModel, constr
+from database import get_db, async_session, upsert_insert
+from auth import require_permission
+from cache import cached_json, if_match_version, response_cache, version_etag
+from responses import FastJSONResponse, RowSchema, dumps
+from pagination import CURSOR_DESCRIPTION, decode_cursor, next_cursor_headers
+from jobs import enqueue, job_queue
+from stats import count_assignments, load_scope_page, load_status_totals
+from broker import broker, task_event
+from pydantic import BaseModel, ValidationError, constr
 from typing import List, Optional
 
 router = APIRouter()
@@ -17,6 +28,15 @@ class TaskCreate(BaseModel):
     title: constr(min_length=1, max_length=100) 
     description: Optional[constr(max_length=500)] = None
 
+class TaskPatch(BaseModel):
+    # Only the fields sent are changed; title has no None default to accept, so it can't be cleared
+    title: constr(min_length=1, max_length=100) = None
+    description: Optional[constr(max_length=500)] = None
+
+class TaskUpdated(BaseModel):
+    msg: str
+    version: int
+
 class TaskRead(BaseModel):
     id: int
     title: str
@@ -26,98 +46,442 @@ class UserRead(BaseModel):
     id: int
     username: str
 
+class AssignmentCreate(BaseModel):
+    task_id: int
+    user_id: int
+
+class BulkCreated(BaseModel):
+    index: int
+    id: int
+
+class BulkError(BaseModel):
+    index: int
+    error: str
+
+class BulkResponse(BaseModel):
+    created: List[BulkCreated]
+    errors: List[BulkError]
+    job_id: Optional[int] = None
+
+
+TASK_ROWS = RowSchema(TaskRead, Task.id, Task.title, Task.description)
+USER_ROWS = RowSchema(UserRead, User.id, User.username)
+
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "10000"))
+
+
+def stream_ndjson(schema: RowSchema, query) -> StreamingResponse:
+    # The request's session is closed once the handler returns, so the stream
+    # owns a session of its own and reads through a server-side cursor.
+    async def rows():
+        async with async_session() as session:
+            result = await session.stream(query)
+            async for partition in result.partitions(500):
+                yield b"".join(dumps(row) + b"\n" for row in schema.rows(partition))
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+
+async def read_bulk_items(request: Request, errors: List[BulkError]) -> list:
+    """Reads a JSON array or an NDJSON body into ``(index, item)`` pairs.
+
+    NDJSON lines that fail to parse are reported in ``errors`` instead of
+    failing the whole request.
+    """
+    if "ndjson" in request.headers.get("content-type", ""):
+        items = []
+        index = 0
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    try:
+                        items.append((index, json.loads(line)))
+                    except ValueError:
+                        errors.append(BulkError(index=index, error="Invalid JSON."))
+                    index += 1
+            if index > BULK_MAX_ITEMS:
+                break
+        if buffer.strip():
+            try:
+                items.append((index, json.loads(buffer)))
+            except ValueError:
+                errors.append(BulkError(index=index, error="Invalid JSON."))
+            index += 1
+    else:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON.")
+        if not isinstance(body, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON.")
+        items = list(enumerate(body))
+        index = len(items)
+
+    if index > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} items per request.")
+    return items
+
+
+def validate_bulk_items(items: list, model, errors: List[BulkError]) -> list:
+    valid = []
+    for index, item in items:
+        try:
+            valid.append((index, model.model_validate(item)))
+        except ValidationError as exc:
+            errors.append(BulkError(index=index, error=exc.errors()[0]["msg"]))
+    return valid
+
+
+async def assignee_ids(db: AsyncSession, task_id: int) -> List[int]:
+    return list((await db.execute(select(TaskAssignment.user_id).where(TaskAssignment.task_id == task_id))).scalars())
+
+
+def chunked(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
 
 @router.post("/createTask", response_model=TaskResponse, tags=["Admin"])
-async def create_task(task_create: TaskCreate, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def create_task(task_create: TaskCreate, current_user: User = Depends(require_permission("tasks:write")), db: AsyncSession = Depends(get_db)):
    
     new_task = Task(**task_create.dict())
     db.add(new_task)
+    await db.flush()
+    await broker.publish(db, task_event("task.created", {"id": new_task.id, "title": new_task.title, "description": new_task.description}))
     await db.commit()
-    await db.refresh(new_task)
+    await response_cache.invalidate("tasks")
     return {"msg": "Task created", "task_id": new_task.id}
 
 
 @router.get("/getTasks", response_model=List[TaskRead], tags=["Task Management"])
-async def get_all_tasks(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    tasks = await db.execute(select(Task))
-    return tasks.scalars().all()
+async def get_all_tasks(
+    request: Request,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    stream: bool = Query(False, description="Stream every task after the cursor as NDJSON."),
+    current_user: User = Depends(require_permission("tasks:read_all")),
+    db: AsyncSession = Depends(get_db)
+):
+    query = select(*TASK_ROWS.columns).order_by(Task.id)
+    if cursor:
+        query = query.where(Task.id > decode_cursor(cursor, "id")[0])
+    if stream:
+        return stream_ndjson(TASK_ROWS, query)
+
+    async def load():
+        tasks = (await db.execute(query.limit(limit))).all()
+        return TASK_ROWS.rows(tasks), next_cursor_headers(tasks, limit)
+
+    return await cached_json(request, "tasks", ("list", limit, cursor), load)
+
+async def missing_task_or_user(db: AsyncSession, task_id: int, user_id: int) -> Optional[str]:
+    """Which of the two rows is missing, or None when both exist."""
+    found = {kind for kind, in await db.execute(union_all(
+        select(literal("task").label("kind")).where(Task.id == task_id),
+        select(literal("user").label("kind")).where(User.id == user_id),
+    ))}
+    if "task" not in found:
+        return "Task not found."
+    if "user" not in found:
+        return "User not found."
+    return None
+
 
 @router.post("/assign-task", tags=["Admin"])
-async def assign_task(task_id: int, user_id: int, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    task = await db.execute(select(Task).where(Task.id == task_id))
-    user = await db.execute(select(User).where(User.id == user_id))
-    
-    task = task.scalar_one_or_none()
-    user = user.scalar_one_or_none()
-    
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found.")
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found.")
-    
-    task_assignment = TaskAssignment(user_id=user_id, task_id=task_id)
-    db.add(task_assignment)
+async def assign_task(task_id: int, user_id: int, current_user: User = Depends(require_permission("tasks:assign")), db: AsyncSession = Depends(get_db)):
+    # No existence checks up front: the foreign keys reject unknown ids and
+    # the unique index turns a repeat into a no-op, so the happy path is a
+    # single INSERT ... RETURNING.
+    try:
+        assignment_id = (await db.execute(
+            upsert_insert(db.bind.dialect.name, TaskAssignment)
+            .on_conflict_do_nothing()
+            .values(task_id=task_id, user_id=user_id, status="pending")
+            .returning(TaskAssignment.id)
+        )).scalar_one_or_none()
+    except IntegrityError:
+        await db.rollback()
+        missing = await missing_task_or_user(db, task_id, user_id)
+        if missing is None:
+            raise  # both rows exist, so some other constraint failed
+        raise HTTPException(status_code=404, detail=missing)
+
+    if assignment_id is None:
+        # Already assigned; repeating the request is harmless
+        existing = await db.execute(
+            select(TaskAssignment.id).where(TaskAssignment.task_id == task_id, TaskAssignment.user_id == user_id)
+        )
+        return {"msg": "Task already assigned", "task_assignment_id": existing.scalar_one(), "job_id": None}
+
+    await count_assignments(db, [(task_id, user_id, "pending", 1)])
+    # Follow-up work runs on the job queue; the client can poll /jobs/{job_id}
+    job = await enqueue(db, "task_assigned", {"assignment_ids": [assignment_id], "assigned_by": current_user.id})
+    await broker.publish(db, task_event(
+        "task.assigned", {"task_id": task_id, "user_id": user_id, "assignment_id": assignment_id}, [user_id]
+    ))
+    await db.commit()
+    job_queue.notify()
+    await response_cache.invalidate("tasks")
+
+    return {"msg": "Task assigned successfully", "task_assignment_id": assignment_id, "job_id": job.id}
+
+@router.post("/tasks:bulk", response_model=BulkResponse, tags=["Admin"])
+async def create_tasks_bulk(
+    request: Request,
+    chunk_size: int = Query(BULK_CHUNK_SIZE, ge=1, le=5000),
+    current_user: User = Depends(require_permission("tasks:write")),
+    db: AsyncSession = Depends(get_db)
+):
+    errors = []
+    items = validate_bulk_items(await read_bulk_items(request, errors), TaskCreate, errors)
+
+    created = []
+    events = []
+    for chunk in chunked(items, chunk_size):
+        result = await db.execute(
+            insert(Task).returning(Task.id, sort_by_parameter_order=True),
+            [task_create.model_dump() for _, task_create in chunk],
+        )
+        for (index, task_create), task_id in zip(chunk, result.scalars()):
+            created.append(BulkCreated(index=index, id=task_id))
+            events.append(task_event("task.created", {"id": task_id, **task_create.model_dump()}))
+    await broker.publish(db, *events)
     await db.commit()
-    await db.refresh(task_assignment)
+    await response_cache.invalidate("tasks")
+
+    return BulkResponse(created=created, errors=sorted(errors, key=lambda error: error.index))
+
 
-    return {"msg": "Task assigned successfully", "task_assignment_id": task_assignment.id}
+@router.post("/assign-tasks:bulk", response_model=BulkResponse, tags=["Admin"])
+async def assign_tasks_bulk(
+    request: Request,
+    chunk_size: int = Query(BULK_CHUNK_SIZE, ge=1, le=5000),
+    current_user: User = Depends(require_permission("tasks:assign")),
+    db: AsyncSession = Depends(get_db)
+):
+    errors = []
+    items = validate_bulk_items(await read_bulk_items(request, errors), AssignmentCreate, errors)
+
+    created = []
+    events = []
+    for chunk in chunked(items, chunk_size):
+        task_ids = {assignment.task_id for _, assignment in chunk}
+        user_ids = {assignment.user_id for _, assignment in chunk}
+        existing = await db.execute(union_all(
+            select(literal("task").label("kind"), Task.id).where(Task.id.in_(task_ids)),
+            select(literal("user").label("kind"), User.id).where(User.id.in_(user_ids)),
+        ))
+        found = {(kind, row_id) for kind, row_id in existing}
+        assigned = set((await db.execute(
+            select(TaskAssignment.task_id, TaskAssignment.user_id)
+            .where(tuple_(TaskAssignment.task_id, TaskAssignment.user_id).in_([(a.task_id, a.user_id) for _, a in chunk]))
+        )).all())
+
+        rows = []
+        for index, assignment in chunk:
+            pair = (assignment.task_id, assignment.user_id)
+            if ("task", assignment.task_id) not in found:
+                errors.append(BulkError(index=index, error="Task not found."))
+            elif ("user", assignment.user_id) not in found:
+                errors.append(BulkError(index=index, error="User not found."))
+            elif pair in assigned:
+                errors.append(BulkError(index=index, error="Task already assigned to this user."))
+            else:
+                assigned.add(pair)
+                rows.append((index, assignment))
+        if not rows:
+            continue
+
+        # A concurrent assign-task may insert a pair after the check above;
+        # that row is skipped here and reported like any other duplicate.
+        result = await db.execute(
+            upsert_insert(db.bind.dialect.name, TaskAssignment)
+            .on_conflict_do_nothing()
+            .returning(TaskAssignment.task_id, TaskAssignment.user_id, TaskAssignment.id),
+            [assignment.model_dump() for _, assignment in rows],
+        )
+        inserted = {(task_id, user_id): assignment_id for task_id, user_id, assignment_id in result}
+        for index, assignment in rows:
+            assignment_id = inserted.get((assignment.task_id, assignment.user_id))
+            if assignment_id is None:
+                errors.append(BulkError(index=index, error="Task already assigned to this user."))
+                continue
+            created.append(BulkCreated(index=index, id=assignment_id))
+            events.append(task_event(
+                "task.assigned", {"task_id": assignment.task_id, "user_id": assignment.user_id, "assignment_id": assignment_id}, [assignment.user_id]
+            ))
+
+    job = None
+    if created:
+        await count_assignments(db, [(item["data"]["task_id"], item["data"]["user_id"], "pending", 1) for item in events])
+        job = await enqueue(db, "task_assigned", {"assignment_ids": [item.id for item in created], "assigned_by": current_user.id})
+        await broker.publish(db, *events)
+    await db.commit()
+    job_queue.notify()
+    await response_cache.invalidate("tasks")
+
+    return BulkResponse(created=created, errors=sorted(errors, key=lambda error: error.index), job_id=job.id if job else None)
 
 @router.delete("/delete-task/{task_id}", response_model=TaskResponse, tags=["Admin"])
-async def delete_task(task_id: int, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def delete_task(task_id: int, current_user: User = Depends(require_permission("tasks:write")), db: AsyncSession = Depends(get_db)):
     task = await db.execute(select(Task).where(Task.id == task_id))
     task = task.scalar_one_or_none()
     
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
+    # Assignments go with the task; their counts come off each assignee's totals
+    removed = (await db.execute(
+        delete(TaskAssignment)
+        .where(TaskAssignment.task_id == task_id)
+        .returning(TaskAssignment.user_id, TaskAssignment.status)
+        .execution_options(synchronize_session=False)
+    )).all()
+    await count_assignments(db, [(task_id, user_id, assignment_status, -1) for user_id, assignment_status in removed])
+    await broker.publish(db, task_event("task.deleted", {"id": task_id}, [user_id for user_id, _ in removed]))
     await db.delete(task)
     await db.commit()
+    await response_cache.invalidate("tasks")
     
     return {"msg": "Task deleted successfully", "task_id": task_id}
 
 
 @router.delete("/unassign-task/{task_id}/{user_id}", tags=["Admin"])
-async def unassign_task(task_id: int, user_id: int, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    assignment = await db.execute(select(TaskAssignment).where(TaskAssignment.task_id == task_id, TaskAssignment.user_id == user_id))
-    assignment = assignment.scalar_one_or_none()
-    
-    if not assignment:
+async def unassign_task(task_id: int, user_id: int, current_user: User = Depends(require_permission("tasks:assign")), db: AsyncSession = Depends(get_db)):
+    deleted = await db.execute(
+        delete(TaskAssignment)
+        .where(TaskAssignment.task_id == task_id, TaskAssignment.user_id == user_id)
+        .returning(TaskAssignment.status)
+        .execution_options(synchronize_session=False)
+    )
+    assignment_status = deleted.scalar_one_or_none()
+    if assignment_status is None:
         raise HTTPException(status_code=404, detail="Task not assigned to this user.")
-    
-    await db.delete(assignment)
+    await count_assignments(db, [(task_id, user_id, assignment_status, -1)])
+
+    await broker.publish(db, task_event("task.unassigned", {"task_id": task_id, "user_id": user_id}, [user_id]))
     await db.commit()
+    await response_cache.invalidate("tasks")
     return {"msg": "Task unassigned successfully"}
 
 
-@router.put("/update-task/{task_id}", tags=["Admin"])
-async def update_task(task_id: int, task_create: TaskCreate, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    task = await db.execute(select(Task).where(Task.id == task_id))
-    task = task.scalar_one_or_none()
-    
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    
-    task.title = task_create.title
-    task.description = task_create.description
+async def update_task_row(request: Request, db: AsyncSession, task_id: int, values: dict):
+    """Applies ``values`` in one UPDATE ... RETURNING, guarded by the If-Match version if one is sent."""
+    query = (
+        update(Task)
+        .where(Task.id == task_id)
+        .values(**values, version=Task.version + 1)
+        .returning(Task.id, Task.title, Task.description, Task.version)
+        .execution_options(synchronize_session=False)
+    )
+    expected = if_match_version(request)
+    if expected is not None:
+        query = query.where(Task.version == expected)
+    task = (await db.execute(query)).first()
+
+    if task is None:
+        # Only a failed update pays for finding out why
+        current = (await db.execute(select(Task.version).where(Task.id == task_id))).scalar_one_or_none()
+        if current is None:
+            raise HTTPException(status_code=404, detail="Task not found")
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="Task was changed by someone else; reload it and retry.",
+            headers={"ETag": version_etag(current)},
+        )
+
+    await broker.publish(db, task_event(
+        "task.updated", {"id": task.id, "title": task.title, "description": task.description, "version": task.version},
+        await assignee_ids(db, task_id),
+    ))
     await db.commit()
-    return {"msg": "Task updated"}
+    await response_cache.invalidate("tasks")
+    return task
+
+
+@router.put("/update-task/{task_id}", response_model=TaskUpdated, tags=["Admin"])
+async def update_task(task_id: int, task_create: TaskCreate, request: Request, response: Response, current_user: User = Depends(require_permission("tasks:write")), db: AsyncSession = Depends(get_db)):
+    task = await update_task_row(request, db, task_id, task_create.model_dump())
+    response.headers["ETag"] = version_etag(task.version)
+    return {"msg": "Task updated", "version": task.version}
+
+
+@router.patch("/update-task/{task_id}", response_model=TaskUpdated, tags=["Admin"])
+async def patch_task(task_id: int, task_patch: TaskPatch, request: Request, response: Response, current_user: User = Depends(require_permission("tasks:write")), db: AsyncSession = Depends(get_db)):
+    values = task_patch.model_dump(exclude_unset=True)
+    if not values:
+        raise HTTPException(status_code=400, detail="No fields to update.")
+    task = await update_task_row(request, db, task_id, values)
+    response.headers["ETag"] = version_etag(task.version)
+    return {"msg": "Task updated", "version": task.version}
+
+    
+@router.get("/stats", tags=["Admin"])
+async def assignment_stats(request: Request, current_user: User = Depends(require_permission("tasks:read_all")), db: AsyncSession = Depends(get_db)):
+    async def load():
+        return await load_status_totals(db), {}
+
+    return await cached_json(request, "tasks", ("stats",), load)
+
+
+async def assignment_stats_page(request: Request, db: AsyncSession, scope: str, limit: int, cursor: Optional[str]):
+    async def load():
+        after = decode_cursor(cursor, scope)[0] if cursor else None
+        page = await load_scope_page(db, scope, limit, after)
+        return page, next_cursor_headers(page, limit, scope, lambda entry: (entry[f"{scope}_id"],))
+
+    return await cached_json(request, "tasks", ("stats", scope, limit, cursor), load)
+
+
+@router.get("/stats/users", tags=["Admin"])
+async def assignment_stats_by_user(
+    request: Request,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    current_user: User = Depends(require_permission("tasks:read_all")),
+    db: AsyncSession = Depends(get_db)
+):
+    return await assignment_stats_page(request, db, "user", limit, cursor)
+
+
+@router.get("/stats/tasks", tags=["Admin"])
+async def assignment_stats_by_task(
+    request: Request,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    current_user: User = Depends(require_permission("tasks:read_all")),
+    db: AsyncSession = Depends(get_db)
+):
+    return await assignment_stats_page(request, db, "task", limit, cursor)
 
     
 @router.get("/users", response_model=List[UserRead], tags=["Admin"])
 async def get_all_users(
-    current_user: User = Depends(get_current_user),
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    stream: bool = Query(False, description="Stream every user after the cursor as NDJSON."),
+    current_user: User = Depends(require_permission("users:read")),
     db: AsyncSession = Depends(get_db)
 ):
-    result = await db.execute(select(User))
-    users = result.scalars().all()
+    query = select(*USER_ROWS.columns).order_by(User.id)
+    if cursor:
+        query = query.where(User.id > decode_cursor(cursor, "id")[0])
+    if stream:
+        return stream_ndjson(USER_ROWS, query)
 
-    user_read_list = [UserRead(id=user.id, username=user.username) for user in users]
-    return user_read_list
+    users = (await db.execute(query.limit(limit))).all()
+    return FastJSONResponse(USER_ROWS.rows(users), headers=next_cursor_headers(users, limit))
 
 @router.get("/users/{user_id}", response_model=UserRead, tags=["Admin"])
 async def get_user_by_id(
     user_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(require_permission("users:read")),
     db: AsyncSession = Depends(get_db)
 ):
     user = await db.execute(select(User).where(User.id == user_id))
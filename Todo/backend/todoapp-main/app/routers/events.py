@@ -0,0 +1,86 @@
+import asyncio
+import os
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from auth import user_from_token, user_permissions
+from broker import Subscription, broker
+from database import async_session
+
+router = APIRouter()
+
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+
+
+async def subscribe(token: Optional[str], all_users: bool) -> Subscription:
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    # A short-lived session: holding the request's one open for the life of
+    # the stream would pin a pooled connection per subscriber.
+    async with async_session() as db:
+        user, claims = await user_from_token(token, db)
+        permissions = await user_permissions(db, user, claims)
+    if all_users and "events:all" not in permissions:
+        raise HTTPException(status_code=403, detail="Only admins can follow every user's events.")
+    return broker.subscribe(user.id, all_users=all_users)
+
+
+def bearer_token(authorization: Optional[str], access_token: Optional[str]) -> Optional[str]:
+    # Browsers can't set headers on EventSource or WebSocket, hence the query parameter
+    if authorization and authorization.lower().startswith("bearer "):
+        return authorization[7:]
+    return access_token
+
+
+@router.get("", tags=["Events"])
+async def event_stream(
+    request: Request,
+    all_users: bool = Query(False, description="Admins only: receive events for every user."),
+    access_token: Optional[str] = Query(None),
+):
+    subscription = await subscribe(bearer_token(request.headers.get("authorization"), access_token), all_users)
+
+    async def events():
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                try:
+                    kind, data = await asyncio.wait_for(subscription.queue.get(), EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                yield b"event: " + kind.encode() + b"\ndata: " + data + b"\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws")
+async def event_socket(websocket: WebSocket, all_users: bool = False, access_token: Optional[str] = None):
+    try:
+        subscription = await subscribe(bearer_token(websocket.headers.get("authorization"), access_token), all_users)
+    except HTTPException as exc:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=exc.detail)
+        return
+    await websocket.accept()
+
+    async def forward():
+        while True:
+            kind, data = await subscription.queue.get()
+            await websocket.send_text('{"type":"%s","data":%s}' % (kind, data.decode()))
+
+    sender = asyncio.create_task(forward())
+    try:
+        # Clients don't send anything; receiving is how a disconnect shows up
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        broker.unsubscribe(subscription)
@@ -0,0 +1,74 @@
+import hmac
+import os
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+from auth import require_permission
+from broker import broker
+from cache import response_cache
+from database import get_db, pool_metrics
+from hashing import hasher
+from instrumentation import render_prometheus
+from ratelimit import admission
+from revocation import denylist
+
+# Shared secret for scrapers that can't log in; admins can always use their own token
+INTERNAL_METRICS_TOKEN = os.getenv("INTERNAL_METRICS_TOKEN", "")
+
+check_manage_users = require_permission("users:manage")
+
+
+async def internal_access(request: Request, db: AsyncSession = Depends(get_db)):
+    """Admits the metrics token or an access token with ``users:manage``; these routes share the public port."""
+    authorization = request.headers.get("authorization", "")
+    if not authorization.lower().startswith("bearer "):
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    token = authorization[7:]
+    if INTERNAL_METRICS_TOKEN and hmac.compare_digest(token.encode(), INTERNAL_METRICS_TOKEN.encode()):
+        return
+    await check_manage_users(token, db)
+
+
+router = APIRouter(dependencies=[Depends(internal_access)])
+
+
+@router.get("/hashing", tags=["Internal"])
+async def hashing_metrics():
+    return hasher.metrics()
+
+
+@router.get("/pool", tags=["Internal"])
+async def database_pool_metrics():
+    return pool_metrics()
+
+
+@router.get("/cache", tags=["Internal"])
+async def cache_metrics():
+    return response_cache.metrics()
+
+
+@router.get("/denylist", tags=["Internal"])
+async def denylist_metrics():
+    return denylist.metrics()
+
+
+@router.get("/events", tags=["Internal"])
+async def event_metrics():
+    return broker.metrics()
+
+
+@router.get("/admission", tags=["Internal"])
+async def admission_metrics():
+    return admission.metrics()
+
+
+@router.get("/metrics", response_class=PlainTextResponse, tags=["Internal"])
+async def prometheus_metrics():
+    return render_prometheus({
+        "password_hashing": hasher.metrics(),
+        "db_pool": pool_metrics(),
+        "response_cache": response_cache.metrics(),
+        "token_denylist": denylist.metrics(),
+        "events": broker.metrics(),
+        "admission": admission.metrics(),
+    })
@@ -0,0 +1,42 @@
+import json
+from fastapi import APIRouter, Depends, HTTPException
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from models import Job, User
+from database import get_db
+from auth import require_permission
+from pydantic import BaseModel
+from typing import Any, Optional
+from datetime import datetime
+
+router = APIRouter()
+
+class JobRead(BaseModel):
+    id: int
+    kind: str
+    status: str
+    attempts: int
+    max_attempts: int
+    run_after: datetime
+    last_error: Optional[str]
+    result: Any
+
+
+@router.get("/{job_id}", response_model=JobRead, tags=["Jobs"])
+async def get_job(job_id: int, current_user: User = Depends(require_permission("tasks:assign")), db: AsyncSession = Depends(get_db)):
+    job = await db.execute(select(Job).where(Job.id == job_id))
+    job = job.scalar_one_or_none()
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return JobRead(
+        id=job.id,
+        kind=job.kind,
+        status=job.status,
+        attempts=job.attempts,
+        max_attempts=job.max_attempts,
+        run_after=job.run_after,
+        last_error=job.last_error,
+        result=json.loads(job.result) if job.result else None,
+    )
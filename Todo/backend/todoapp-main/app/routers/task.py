@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import or_, text, tuple_
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
-from models import Task
+from models import Task, TaskAssignment, TASK_SEARCH_VECTOR
 from database import get_db
 from pydantic import BaseModel, constr
 from typing import List, Optional
-from auth import get_current_user
+from auth import get_current_user, oauth2_scheme, user_or_permission
+from cache import cached_json, version_etag
+from pagination import CURSOR_DESCRIPTION, decode_cursor, next_cursor_headers
+from responses import FastJSONResponse, RowSchema
 from models import User
 
 router = APIRouter()
@@ -15,14 +19,76 @@ class TaskRead(BaseModel):
     title: str
     description: Optional[str]
 
+TASK_ROWS = RowSchema(TaskRead, Task.id, Task.title, Task.description)
+
+# sort -> (column, descending, cursor value types)
+SEARCH_SORTS = {
+    "id": (Task.id, False, (int, int)),
+    "-id": (Task.id, True, (int, int)),
+    "title": (Task.title, False, (str, int)),
+    "-title": (Task.title, True, (str, int)),
+}
+
+
+def text_match(dialect: str, q: str):
+    if dialect == "postgresql":
+        return text(f"{TASK_SEARCH_VECTOR} @@ websearch_to_tsquery('english', :q)").bindparams(q=q)
+    # SQLite and friends: substring match, good enough for tests and small data
+    return or_(Task.title.icontains(q, autoescape=True), Task.description.icontains(q, autoescape=True))
+
+
+# Registered before "/{task_id}" so "search" is not parsed as an id
+@router.get("/search", response_model=List[TaskRead], tags=["Task Management"])
+async def search_tasks(
+    q: Optional[str] = Query(None, min_length=1, max_length=200, description="Words to look for in the title or description."),
+    assignee: Optional[int] = Query(None, description="Only tasks assigned to this user id."),
+    assignment_status: Optional[str] = Query(None, alias="status", description="Only tasks with an assignment in this status."),
+    sort: str = Query("id", pattern="^-?(id|title)$"),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+):
+    # Anyone may search their own assignments; everything else needs read_all
+    await user_or_permission(token, db, assignee, "tasks:read_all")
+    key, descending, cursor_types = SEARCH_SORTS[sort]
+    query = select(*TASK_ROWS.columns)
+
+    if q:
+        query = query.where(text_match(db.bind.dialect.name, q))
+    if assignee is not None or assignment_status is not None:
+        assigned = select(TaskAssignment.id).where(TaskAssignment.task_id == Task.id)
+        if assignee is not None:
+            assigned = assigned.where(TaskAssignment.user_id == assignee)
+        if assignment_status is not None:
+            assigned = assigned.where(TaskAssignment.status == assignment_status)
+        query = query.where(assigned.exists())
+
+    position = tuple_(key, Task.id)
+    if cursor:
+        after = tuple_(*decode_cursor(cursor, sort, cursor_types))
+        query = query.where(position < after if descending else position > after)
+    if descending:
+        query = query.order_by(key.desc(), Task.id.desc())
+    else:
+        query = query.order_by(key, Task.id)
+
+    rows = (await db.execute(query.limit(limit))).all()
+    headers = next_cursor_headers(rows, limit, sort, lambda row: (getattr(row, key.key), row.id))
+    return FastJSONResponse(TASK_ROWS.rows(rows), headers=headers)
+
 
 @router.get("/{task_id}", response_model=TaskRead, tags=["Task Management"])
-async def get_task_by_id(task_id: int, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    task = await db.execute(select(Task).where(Task.id == task_id))
-    task = task.scalar_one_or_none()
-    
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    
-    return task
+async def get_task_by_id(task_id: int, request: Request, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    async def load():
+        task = await db.execute(select(*TASK_ROWS.columns, Task.version).where(Task.id == task_id))
+        task = task.first()
+
+        if not task:
+            raise HTTPException(status_code=404, detail="Task not found")
+
+        # The ETag is the row version, so it can go straight back in If-Match
+        *columns, version = task
+        return TASK_ROWS.rows([columns])[0], {"ETag": version_etag(version)}
 
+    return await cached_json(request, "tasks", ("task", task_id), load)
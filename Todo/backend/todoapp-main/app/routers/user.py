@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
-from models import User, TaskAssignment
+from models import User, Task, TaskAssignment
 from database import get_db
-from auth import get_current_user, get_password_hash, verify_password, create_access_token
+from auth import get_password_hash, oauth2_scheme, user_or_permission, verify_password, create_access_token, create_refresh_token, grant_roles, load_roles
+from cache import cached_json
+from pagination import CURSOR_DESCRIPTION, decode_cursor, next_cursor_headers
+from ratelimit import rate_limiter
 from pydantic import BaseModel
 from typing import List, Optional
 
@@ -17,10 +20,12 @@ class UserResponse(BaseModel):
     msg: str
     user_id: Optional[int] = None
     access_token: Optional[str] = None
+    refresh_token: Optional[str] = None
 
 
 @router.post("/register", response_model=UserResponse, tags=["User"])
 async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
+    await rate_limiter.check_username(user.username)
 
     # Check if the username already exists
     existing_user = await db.execute(select(User).where(User.username == user.username))
@@ -30,47 +35,56 @@ async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
             detail="Username already exists."
         )
 
+    # Give the connection back to the pool while bcrypt runs
+    await db.close()
+
     # Create new user with hashed password
-    new_user = User(username=user.username, hashed_password=get_password_hash(user.password))
+    new_user = User(username=user.username, hashed_password=await get_password_hash(user.password))
     db.add(new_user)
-    await db.commit()
-    await db.refresh(new_user)
+    await db.flush()
 
     # Set the role as 'user' for all users
     roles = ["user"]
+    await grant_roles(db, new_user.id, roles)
 
     # Create access token with the 'user' role
-    access_token = create_access_token(data={"sub": new_user.username, "roles": roles})
+    access_token = create_access_token(data={"sub": new_user.username, "uid": new_user.id, "roles": roles})
+    refresh_token = await create_refresh_token(db, new_user.id, new_user.username, roles)
+    await db.commit()
 
     return {
         "msg": "User registered successfully!",
         "user_id": new_user.id,
-        "access_token": access_token
+        "access_token": access_token,
+        "refresh_token": refresh_token
     }
 
 
 @router.post("/login/user", response_model=UserResponse, tags=["User"])
 async def login(user: UserCreate, db: AsyncSession = Depends(get_db)):
+    await rate_limiter.check_username(user.username)
 
     # Check if the user exists
     user_db = await db.execute(select(User).where(User.username == user.username))
     user_db = user_db.scalar_one_or_none()
+    await db.close()
 
-    if not user_db or not verify_password(user.password, user_db.hashed_password):
+    if not user_db or not await verify_password(user.password, user_db.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials."
         )
 
-    # Set the role as 'user' for all users
-    roles = ["user"]
+    roles = await load_roles(db, user_db.id)
 
-    # Create access token with the 'user' role
-    access_token = create_access_token(data={"sub": user_db.username, "roles": roles})
+    access_token = create_access_token(data={"sub": user_db.username, "uid": user_db.id, "roles": roles})
+    refresh_token = await create_refresh_token(db, user_db.id, user_db.username, roles)
+    await db.commit()
 
     return {
         "msg": "Login successful",
         "access_token": access_token,
+        "refresh_token": refresh_token,
         "token_type": "bearer"
     }
 
@@ -78,12 +92,23 @@ async def login(user: UserCreate, db: AsyncSession = Depends(get_db)):
 @router.get("/tasks/{user_id}", tags=["User"])
 async def get_tasks(
     user_id: int,
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    task_status: Optional[str] = Query(None, alias="status"),
+    token: str = Depends(oauth2_scheme),
     db: AsyncSession = Depends(get_db)
 ):
+    await user_or_permission(token, db, user_id, "tasks:read_all")
+    return await cached_json(
+        request, "tasks", ("user", user_id, limit, cursor, task_status),
+        lambda: load_user_tasks(db, user_id, limit, cursor, task_status),
+    )
 
+
+async def load_user_tasks(db: AsyncSession, user_id: int, limit: int, cursor: Optional[str], task_status: Optional[str]):
     # Fetch user by ID
-    user = await db.execute(select(User).where(User.id == user_id))
+    user = await db.execute(select(User.id).where(User.id == user_id))
     user = user.scalar_one_or_none()
     if not user:
         raise HTTPException(
@@ -91,8 +116,22 @@ async def get_tasks(
             detail="User not found."
         )
 
-    # Get task assignments for the user
-    assignments = await db.execute(select(TaskAssignment).where(TaskAssignment.user_id == user_id))
-    tasks = [assignment.task for assignment in assignments]
-
-    return {"tasks": tasks}
+    # Get the user's tasks in one joined query, one page at a time
+    query = (
+        select(TaskAssignment.id.label("assignment_id"), Task.id, Task.title, Task.description, TaskAssignment.status)
+        .join(Task, Task.id == TaskAssignment.task_id)
+        .where(TaskAssignment.user_id == user_id)
+        .order_by(TaskAssignment.id)
+        .limit(limit)
+    )
+    if cursor:
+        query = query.where(TaskAssignment.id > decode_cursor(cursor, "assignment")[0])
+    if task_status is not None:
+        query = query.where(TaskAssignment.status == task_status)
+    rows = (await db.execute(query)).all()
+
+    tasks = [
+        {"id": row.id, "title": row.title, "description": row.description, "status": row.status}
+        for row in rows
+    ]
+    return {"tasks": tasks}, next_cursor_headers(rows, limit, "assignment", lambda row: (row.assignment_id,))
@@ -0,0 +1,96 @@
+"""Production entry point.
+
+    APP_ENV=production python serve.py
+
+Migrates the database once, then starts WEB_CONCURRENCY uvicorn workers (one
+per CPU by default) on uvloop and httptools when they are installed. Each
+worker creates tables (outside production) under the schema lock and warms
+its connection pool in the lifespan handler before it takes requests. On
+SIGTERM workers stop accepting connections and get GRACEFUL_TIMEOUT seconds
+to finish in-flight requests and jobs before the pool is closed.
+
+Workers are separate processes, so with more than one every piece of state
+they must agree on has to live outside them: CACHE_BACKEND=redis or none,
+RATE_LIMIT_BACKEND=redis (or RATE_LIMIT_ENABLED=false), and PostgreSQL for
+the events broker. An unset CACHE_BACKEND falls back to none; any other
+in-memory backend stops the server from starting.
+"""
+import importlib.util
+import os
+from typing import List
+import uvicorn
+from database import APP_ENV, env_bool
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+KEEPALIVE_TIMEOUT = int(os.getenv("KEEPALIVE_TIMEOUT", "5"))
+ACCESS_LOG = env_bool("ACCESS_LOG", False)
+# Run `alembic upgrade head` before the workers start; off when a deploy step does it
+MIGRATE_ON_START = env_bool("MIGRATE_ON_START", APP_ENV == "production")
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def migrate():
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(APP_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(APP_DIR, "alembic"))
+    command.upgrade(config, "head")
+
+
+def per_process_backends() -> List[str]:
+    """The configured backends that would give each worker its own copy of shared state."""
+    from broker import EVENTS_BROKER
+    from cache import CACHE_BACKEND
+    from database import engine
+    from ratelimit import RATE_LIMIT_BACKEND, RATE_LIMIT_ENABLED
+
+    backends = []
+    if CACHE_BACKEND == "memory":
+        backends.append("CACHE_BACKEND=memory")
+    if RATE_LIMIT_ENABLED and RATE_LIMIT_BACKEND == "memory":
+        backends.append("RATE_LIMIT_BACKEND=memory")
+    if EVENTS_BROKER == "memory" or (EVENTS_BROKER == "auto" and engine.dialect.name != "postgresql"):
+        backends.append("the in-memory events broker")
+    return backends
+
+
+def main():
+    if WEB_CONCURRENCY > 1:
+        # A cache each worker invalidates on its own serves stale responses;
+        # the workers inherit this environment
+        os.environ.setdefault("CACHE_BACKEND", "none")
+        backends = per_process_backends()
+        if backends:
+            raise SystemExit(
+                f"WEB_CONCURRENCY={WEB_CONCURRENCY} starts separate worker processes, but these keep their state "
+                f"in each one: {', '.join(backends)}. Use shared backends or set WEB_CONCURRENCY=1."
+            )
+    if MIGRATE_ON_START:
+        migrate()
+    uvicorn.run(
+        "main:app",
+        app_dir=APP_DIR,
+        host=HOST,
+        port=PORT,
+        workers=WEB_CONCURRENCY,
+        loop="uvloop" if installed("uvloop") else "asyncio",
+        http="httptools" if installed("httptools") else "h11",
+        lifespan="on",
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+        timeout_keep_alive=KEEPALIVE_TIMEOUT,
+        proxy_headers=True,
+        access_log=ACCESS_LOG,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import logging
+import os
+from collections import Counter
+from datetime import timedelta
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy import delete, func, text
+from sqlmodel import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from cache import response_cache
+from database import async_session, upsert_insert
+from jobs import enqueue, job_handler
+from models import AssignmentCount, Job, TaskAssignment, utcnow
+
+# How often the counters are checked against taskassignment; 0 never checks
+STATS_RECONCILE_SECONDS = float(os.getenv("STATS_RECONCILE_SECONDS", "3600"))
+RECONCILE_JOB = "reconcile_assignment_counts"
+
+logger = logging.getLogger("stats")
+
+# (task_id, user_id, status, +1 or -1)
+AssignmentChange = Tuple[int, int, str, int]
+
+
+def upsert_counts(dialect: str):
+    """``INSERT ... ON CONFLICT DO UPDATE`` that adds to the existing count."""
+    query = upsert_insert(dialect, AssignmentCount)
+    return query.on_conflict_do_update(
+        index_elements=["scope", "key", "status"],
+        set_={"count": AssignmentCount.count + query.excluded.count},
+    )
+
+
+async def count_assignments(db: AsyncSession, changes: Iterable[AssignmentChange]):
+    """Applies assignment changes to the counters in the caller's transaction."""
+    totals = Counter()
+    for task_id, user_id, status, delta in changes:
+        totals["task", task_id, status] += delta
+        totals["user", user_id, status] += delta
+    # A fixed order keeps concurrent transactions from deadlocking on the rows
+    rows = [
+        {"scope": scope, "key": key, "status": status, "count": delta}
+        for (scope, key, status), delta in sorted(totals.items()) if delta
+    ]
+    if rows:
+        await db.execute(upsert_counts(db.bind.dialect.name), rows)
+
+
+async def load_status_totals(db: AsyncSession) -> dict:
+    """Assignment counts by status, summed from the per-user counters."""
+    rows = await db.execute(
+        select(AssignmentCount.status, func.sum(AssignmentCount.count))
+        .where(AssignmentCount.scope == "user", AssignmentCount.count > 0)
+        .group_by(AssignmentCount.status)
+        .order_by(AssignmentCount.status)
+    )
+    by_status = {status: count for status, count in rows}
+    return {"total": sum(by_status.values()), "by_status": by_status}
+
+
+async def load_scope_page(db: AsyncSession, scope: str, limit: int, after: Optional[int]) -> List[dict]:
+    """Counts for up to ``limit`` users or tasks with a key above ``after``, in key order."""
+    keys = (
+        select(AssignmentCount.key)
+        .where(AssignmentCount.scope == scope, AssignmentCount.count > 0)
+        .distinct()
+        .order_by(AssignmentCount.key)
+        .limit(limit)
+    )
+    if after is not None:
+        keys = keys.where(AssignmentCount.key > after)
+    rows = await db.execute(
+        select(AssignmentCount.key, AssignmentCount.status, AssignmentCount.count)
+        .where(AssignmentCount.scope == scope, AssignmentCount.count > 0, AssignmentCount.key.in_(keys.scalar_subquery()))
+        .order_by(AssignmentCount.key, AssignmentCount.status)
+    )
+    page = {}
+    for key, status, count in rows:
+        page.setdefault(key, {})[status] = count
+    return [{f"{scope}_id": key, "total": sum(counts.values()), "by_status": counts} for key, counts in page.items()]
+
+
+async def actual_counts(db: AsyncSession) -> Counter:
+    """The counters as a full ``GROUP BY`` over taskassignment computes them."""
+    counts = Counter()
+    for scope, column in (("user", TaskAssignment.user_id), ("task", TaskAssignment.task_id)):
+        rows = await db.execute(
+            select(column, TaskAssignment.status, func.count())
+            .where(TaskAssignment.task_id.is_not(None), TaskAssignment.user_id.is_not(None))
+            .group_by(column, TaskAssignment.status)
+        )
+        for key, status, count in rows:
+            counts[scope, key, status] = count
+    return counts
+
+
+async def stored_counts(db: AsyncSession) -> Counter:
+    rows = await db.execute(select(AssignmentCount.scope, AssignmentCount.key, AssignmentCount.status, AssignmentCount.count))
+    return Counter({(scope, key, status): count for scope, key, status, count in rows})
+
+
+async def schedule_reconciliation(db: AsyncSession, delay: float = STATS_RECONCILE_SECONDS):
+    """Queues the next check unless one is already waiting, so each deployment runs a single chain."""
+    if not STATS_RECONCILE_SECONDS:
+        return
+    pending = await db.execute(select(Job.id).where(Job.kind == RECONCILE_JOB, Job.status == "queued").limit(1))
+    if pending.first() is None:
+        await enqueue(db, RECONCILE_JOB, {}, run_after=utcnow() + timedelta(seconds=delay))
+
+
+async def start_reconciliation():
+    # Run straight away when nothing is queued, e.g. on the first start after
+    # the counters table was created empty
+    async with async_session() as db:
+        await schedule_reconciliation(db, delay=0)
+        await db.commit()
+
+
+@job_handler(RECONCILE_JOB)
+async def reconcile_assignment_counts(payload: dict) -> dict:
+    async with async_session() as db:
+        if db.bind.dialect.name == "postgresql":
+            # Holds off count_assignments until the corrections commit, so no
+            # increment lands between the GROUP BY and the corrections
+            await db.execute(text("LOCK TABLE assignmentcount IN EXCLUSIVE MODE"))
+        actual = await actual_counts(db)
+        stored = await stored_counts(db)
+        drifted = [key for key in actual if actual[key] != stored[key]]
+        empty = [key for key in stored if not actual[key]]
+
+        for scope, key, status in empty:
+            await db.execute(delete(AssignmentCount).where(
+                AssignmentCount.scope == scope, AssignmentCount.key == key, AssignmentCount.status == status
+            ))
+        if drifted:
+            logger.warning("Corrected %s assignment counters that had drifted from taskassignment", len(drifted))
+            await db.execute(upsert_counts(db.bind.dialect.name), [
+                {"scope": scope, "key": key, "status": status, "count": actual[scope, key, status] - stored[scope, key, status]}
+                for scope, key, status in sorted(drifted)
+            ])
+        await schedule_reconciliation(db)
+        await db.commit()
+    if drifted or empty:
+        await response_cache.invalidate("tasks")
+    return {"checked": len(actual), "corrected": len(drifted), "removed": len(empty)}
@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+
+# The app reads its settings at import time, so these have to be set before
+# any app module is imported. DATABASE_URL can point at Postgres instead.
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/test.db")
+os.environ.setdefault("CACHE_BACKEND", "none")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import pytest
+from sqlalchemy import event
+from sqlmodel import SQLModel
+from auth import permission_cache, principal_cache
+from database import engine, init_db
+from main import app
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    # One event loop for the whole run, so pooled connections stay usable
+    return "asyncio"
+
+
+@pytest.fixture
+async def client():
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.drop_all)
+    await init_db()
+    principal_cache.clear()
+    permission_cache.clear()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+async def register(client: httpx.AsyncClient, username: str, is_admin: bool = False, headers: dict = None) -> dict:
+    response = await client.post(
+        "/auth/register", json={"username": username, "password": "secret", "is_admin": is_admin}, headers=headers or {}
+    )
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+async def admin_headers(client) -> dict:
+    return await register(client, "admin", is_admin=True)
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+@pytest.fixture
+def statements():
+    counter = StatementCounter()
+    event.listen(engine.sync_engine, "before_cursor_execute", counter)
+    yield counter
+    event.remove(engine.sync_engine, "before_cursor_execute", counter)
@@ -0,0 +1,27 @@
+import pytest
+from conftest import register
+from database import upsert_insert
+from models import TaskAssignment
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_assign_reports_the_missing_row(client, admin_headers):
+    task_id = (await client.post("/admin/createTask", json={"title": "t"}, headers=admin_headers)).json()["task_id"]
+    await register(client, "bob")
+
+    response = await client.post("/admin/assign-task", params={"task_id": 999, "user_id": 2}, headers=admin_headers)
+    assert (response.status_code, response.json()["detail"]) == (404, "Task not found.")
+    response = await client.post("/admin/assign-task", params={"task_id": task_id, "user_id": 999}, headers=admin_headers)
+    assert (response.status_code, response.json()["detail"]) == (404, "User not found.")
+
+    first = await client.post("/admin/assign-task", params={"task_id": task_id, "user_id": 2}, headers=admin_headers)
+    repeat = await client.post("/admin/assign-task", params={"task_id": task_id, "user_id": 2}, headers=admin_headers)
+    assert repeat.status_code == 200
+    assert repeat.json()["task_assignment_id"] == first.json()["task_assignment_id"]
+    assert repeat.json()["job_id"] is None
+
+
+def test_upsert_insert_rejects_other_databases():
+    with pytest.raises(ValueError, match="PostgreSQL or SQLite"):
+        upsert_insert("mysql", TaskAssignment)
@@ -0,0 +1,98 @@
+import pytest
+import auth
+from cache import TTLCache
+from conftest import register
+from database import async_session
+from models import User
+from sqlmodel import select
+
+pytestmark = pytest.mark.anyio
+
+
+def token_of(headers: dict) -> str:
+    return headers["Authorization"].removeprefix("Bearer ")
+
+
+async def test_missing_permission_is_forbidden(client, admin_headers):
+    headers = await register(client, "bob")
+    response = await client.post("/admin/createTask", json={"title": "nope"}, headers=headers)
+    assert response.status_code == 403
+
+    response = await client.post("/admin/createTask", json={"title": "yes"}, headers=admin_headers)
+    assert response.status_code == 200
+
+
+async def test_other_users_tasks_need_read_all(client, admin_headers):
+    bob = await register(client, "bob")  # user 2
+    await register(client, "carol")  # user 3
+
+    assert (await client.get("/user/tasks/2", headers=bob)).status_code == 200
+    assert (await client.get("/user/tasks/3", headers=bob)).status_code == 403
+    assert (await client.get("/user/tasks/3", headers=admin_headers)).status_code == 200
+
+
+async def test_search_beyond_own_assignments_needs_read_all(client, admin_headers):
+    bob = await register(client, "bob")  # user 2
+
+    assert (await client.get("/task/search", params={"assignee": 2}, headers=bob)).status_code == 200
+    assert (await client.get("/task/search", params={"assignee": 1}, headers=bob)).status_code == 403
+    assert (await client.get("/task/search", params={"q": "x"}, headers=bob)).status_code == 403
+    assert (await client.get("/task/search", params={"q": "x"}, headers=admin_headers)).status_code == 200
+
+
+async def test_job_status_needs_a_permission(client, admin_headers):
+    task_id = (await client.post("/admin/createTask", json={"title": "t"}, headers=admin_headers)).json()["task_id"]
+    headers = await register(client, "bob")
+    job_id = (await client.post("/admin/assign-task", params={"task_id": task_id, "user_id": 2}, headers=admin_headers)).json()["job_id"]
+
+    assert (await client.get(f"/jobs/{job_id}", headers=headers)).status_code == 403
+    assert (await client.get(f"/jobs/{job_id}", headers=admin_headers)).status_code == 200
+
+
+async def test_role_change_invalidates_cached_permissions(client, admin_headers):
+    headers = await register(client, "bob")
+    assert (await client.get("/admin/users", headers=headers)).status_code == 403  # caches an empty set
+
+    async with async_session() as db:
+        bob = (await db.execute(select(User).where(User.username == "bob"))).scalar_one()
+        await auth.grant_roles(db, bob.id, ["admin"])
+        await db.commit()
+
+    assert (await client.get("/admin/users", headers=headers)).status_code == 200
+
+
+async def test_admin_registration_gate(client):
+    # Nobody holds the admin role yet, so the first admin may sign up alone
+    admin_headers = await register(client, "first", is_admin=True)
+
+    response = await client.post("/auth/register", json={"username": "second", "password": "secret", "is_admin": True})
+    assert response.status_code == 403
+
+    user_headers = await register(client, "bob")
+    response = await client.post(
+        "/auth/register", json={"username": "second", "password": "secret", "is_admin": True}, headers=user_headers
+    )
+    assert response.status_code == 403
+
+    await register(client, "second", is_admin=True, headers=admin_headers)
+
+
+async def test_warm_permission_check_runs_no_sql(client, admin_headers, statements):
+    check = auth.require_permission("tasks:read_all")
+    async with async_session() as db:
+        await check(token_of(admin_headers), db)
+        statements.count = 0
+        user = await check(token_of(admin_headers), db)
+    assert user.username == "admin"
+    assert statements.count == 0
+
+
+async def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    cache.set("d", 4, expires_at=0)
+    assert cache.get("d") is None
@@ -0,0 +1,35 @@
+import json
+from broker import NOTIFY_MAX_BYTES, PostgresBroker, task_event
+
+
+def notify_all(broker: PostgresBroker, events) -> list:
+    payloads = broker._payloads(events)
+    for payload in payloads:
+        broker._on_notify(None, 0, broker.channel, payload)
+    return payloads
+
+
+def test_events_too_big_for_one_notify_are_split_by_recipient():
+    broker = PostgresBroker("postgresql://unused")
+    recipients = range(100000, 103000)
+    subscriptions = {user_id: broker.subscribe(user_id) for user_id in (100000, 101500, 102999)}
+    admin = broker.subscribe(1, all_users=True)
+    events = [task_event("task.updated", {"id": 1}), task_event("task.assigned", {"id": 2}, recipients)]
+
+    payloads = notify_all(broker, events)
+
+    assert len(payloads) > 1
+    assert all(len(payload.encode()) <= NOTIFY_MAX_BYTES for payload in payloads)
+    sent = [change for payload in payloads for change in json.loads(payload)]
+    assert sorted(user_id for change in sent for user_id in change["user_ids"]) == list(recipients)
+    # Every recipient, and the all-users subscriber, gets each event once
+    for subscription in subscriptions.values():
+        assert subscription.queue.qsize() == 1
+    assert admin.queue.qsize() == 2
+
+
+def test_events_that_cannot_be_split_are_dropped():
+    broker = PostgresBroker("postgresql://unused")
+    events = [task_event("task.updated", {"description": "x" * NOTIFY_MAX_BYTES}, [1]), task_event("task.updated", {"id": 1}, [1])]
+    payloads = broker._payloads(events)
+    assert [change["data"] for payload in payloads for change in json.loads(payload)] == [{"id": 1}]
@@ -0,0 +1,63 @@
+import json
+import pytest
+from sqlalchemy import insert
+from database import engine
+from models import User
+from routers import admin
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_bulk_create_reports_invalid_items(client, admin_headers):
+    body = [{"title": "a"}, {"title": ""}, {"title": "c", "description": "d"}]
+    response = await client.post("/admin/tasks:bulk", json=body, headers=admin_headers)
+    assert response.status_code == 200
+    assert [item["index"] for item in response.json()["created"]] == [0, 2]
+    assert [item["index"] for item in response.json()["errors"]] == [1]
+
+
+async def test_bulk_create_accepts_ndjson(client, admin_headers):
+    body = b'{"title": "a"}\nnot json\n\n{"title": "b"}'
+    response = await client.post(
+        "/admin/tasks:bulk", content=body, headers={**admin_headers, "Content-Type": "application/x-ndjson"}
+    )
+    assert [item["index"] for item in response.json()["created"]] == [0, 2]
+    assert response.json()["errors"] == [{"index": 1, "error": "Invalid JSON."}]
+
+
+async def test_bulk_assign_reports_each_failure(client, admin_headers):
+    await client.post("/admin/tasks:bulk", json=[{"title": "a"}, {"title": "b"}], headers=admin_headers)
+    async with engine.begin() as conn:
+        await conn.execute(insert(User), [{"username": "bob", "hashed_password": "x"}])
+    await client.post("/admin/assign-task", params={"task_id": 1, "user_id": 2}, headers=admin_headers)
+
+    body = [
+        {"task_id": 2, "user_id": 2},
+        {"task_id": 1, "user_id": 2},  # assigned above
+        {"task_id": 9, "user_id": 2},
+        {"task_id": 2, "user_id": 9},
+        {"task_id": 2, "user_id": 2},  # repeated within the batch
+        {"task_id": "x"},
+        {"task_id": 2, "user_id": 1},
+    ]
+    response = await client.post("/admin/assign-tasks:bulk", content="\n".join(map(json.dumps, body)),
+                                 headers={**admin_headers, "Content-Type": "application/x-ndjson"})
+    result = response.json()
+    assert [item["index"] for item in result["created"]] == [0, 6]
+    assert {item["index"]: item["error"] for item in result["errors"] if item["index"] != 5} == {
+        1: "Task already assigned to this user.",
+        2: "Task not found.",
+        3: "User not found.",
+        4: "Task already assigned to this user.",
+    }
+    assert 5 in {item["index"] for item in result["errors"]}
+    assert result["job_id"] is not None
+
+
+async def test_bulk_requests_are_capped(client, admin_headers, monkeypatch):
+    monkeypatch.setattr(admin, "BULK_MAX_ITEMS", 3)
+    response = await client.post("/admin/tasks:bulk", json=[{"title": str(i)} for i in range(4)], headers=admin_headers)
+    assert response.status_code == 413
+    body = "\n".join(json.dumps({"title": str(i)}) for i in range(4))
+    response = await client.post("/admin/tasks:bulk", content=body, headers={**admin_headers, "Content-Type": "application/x-ndjson"})
+    assert response.status_code == 413
@@ -0,0 +1,35 @@
+import anyio
+import httpx
+import pytest
+import instrumentation
+from instrumentation import InstrumentationMiddleware
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_concurrent_requests_share_one_profile(tmp_path, monkeypatch):
+    monkeypatch.setattr(instrumentation, "Profiler", None)
+    release = anyio.Event()
+
+    async def app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    middleware = InstrumentationMiddleware(app, sample_rate=1, profile_dir=str(tmp_path))
+    statuses = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=middleware), base_url="http://test") as client:
+        async def get(path):
+            statuses.append((await client.get(path)).status_code)
+
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(get, "/first")
+            tg.start_soon(get, "/second")
+            await anyio.sleep(0.05)
+            release.set()
+        # Sampling resumes once the running profile is saved
+        await get("/third")
+
+    assert statuses == [200, 200, 200]
+    assert len(list(tmp_path.glob("*.prof"))) == 2
+    assert middleware.in_flight == 0
@@ -0,0 +1,90 @@
+import json
+from datetime import timedelta
+import anyio
+import pytest
+import jobs
+from sqlmodel import select
+from database import async_session
+from jobs import JobQueue, enqueue
+from models import Job, utcnow
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def echo(monkeypatch):
+    async def handler(payload: dict) -> dict:
+        return payload
+
+    monkeypatch.setitem(jobs.handlers, "echo", handler)
+
+
+async def add_job(**values) -> int:
+    async with async_session() as db:
+        job = await enqueue(db, "echo", {"n": 1})
+        for name, value in values.items():
+            setattr(job, name, value)
+        await db.commit()
+        return job.id
+
+
+async def wait_for_status(job_id: int, status: str) -> Job:
+    with anyio.fail_after(5):
+        while True:
+            async with async_session() as db:
+                job = (await db.execute(select(Job).where(Job.id == job_id))).scalar_one()
+            if job.status == status:
+                return job
+            await anyio.sleep(0.01)
+
+
+async def test_worker_survives_a_failure_to_record_a_job(client, echo, monkeypatch):
+    queue = JobQueue(workers=1, poll_interval=0.01)
+    run = queue._run
+    calls = []
+
+    async def flaky_run(job):
+        calls.append(job.id)
+        if len(calls) == 1:
+            raise RuntimeError("database went away")
+        await run(job)
+
+    monkeypatch.setattr(queue, "_run", flaky_run)
+    lost, kept = await add_job(), await add_job()
+    await queue.start()
+    try:
+        job = await wait_for_status(kept, "done")
+    finally:
+        await queue.stop()
+    assert json.loads(job.result) == {"n": 1}
+    assert calls == [lost, kept]
+
+
+async def test_stale_jobs_are_requeued_while_workers_run(client, echo):
+    queue = JobQueue(workers=1, poll_interval=0.01, stale_seconds=0.2)
+    await queue.start()
+    try:
+        # Left behind by a worker that died after claiming it
+        job_id = await add_job(status="running", attempts=1, updated_at=utcnow() - timedelta(hours=1))
+        job = await wait_for_status(job_id, "done")
+    finally:
+        await queue.stop()
+    assert job.attempts == 2
+
+
+async def test_long_jobs_are_not_taken_for_stale(client, monkeypatch):
+    runs = []
+
+    async def slow(payload: dict) -> dict:
+        runs.append(payload)
+        await anyio.sleep(0.5)
+        return {}
+
+    monkeypatch.setitem(jobs.handlers, "echo", slow)
+    queue = JobQueue(workers=2, poll_interval=0.01, stale_seconds=0.2)
+    await queue.start()
+    try:
+        await wait_for_status(await add_job(), "done")
+    finally:
+        await queue.stop()
+    assert len(runs) == 1
@@ -0,0 +1,43 @@
+import pytest
+from sqlalchemy import insert, text
+from database import engine
+from models import Task, TaskAssignment, User
+
+pytestmark = pytest.mark.anyio
+
+ASSIGNMENTS = 20000
+
+LOOKUPS = {
+    "by user": "SELECT id FROM taskassignment WHERE user_id = 7",
+    "by task": "SELECT id FROM taskassignment WHERE task_id = 7",
+    "by task and user": "SELECT id FROM taskassignment WHERE task_id = 7 AND user_id = 7",
+    "by status": "SELECT id FROM taskassignment WHERE status = 'done'",
+}
+
+
+async def seed(count: int):
+    async with engine.begin() as conn:
+        await conn.execute(insert(User), [{"username": f"user{i}", "hashed_password": "x"} for i in range(count // 50)])
+        await conn.execute(insert(Task), [{"title": f"task {i}"} for i in range(50)])
+        await conn.execute(insert(TaskAssignment), [
+            {"user_id": i // 50 + 1, "task_id": i % 50 + 1, "status": "done" if i % 100 == 0 else "pending"}
+            for i in range(count)
+        ])
+
+
+async def explain(conn, sql: str) -> str:
+    if conn.dialect.name == "sqlite":
+        rows = await conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))
+        return " / ".join(row[-1] for row in rows)
+    # Small tables may still be cheapest to scan; make the planner show whether an index exists
+    await conn.execute(text("SET LOCAL enable_seqscan = off"))
+    rows = await conn.execute(text(f"EXPLAIN {sql}"))
+    return " / ".join(row[0] for row in rows)
+
+
+@pytest.mark.parametrize("lookup", LOOKUPS)
+async def test_assignment_lookup_uses_an_index(client, lookup):
+    await seed(ASSIGNMENTS)
+    async with engine.begin() as conn:
+        plan = (await explain(conn, LOOKUPS[lookup])).upper()
+    assert "INDEX" in plan and "SEQ SCAN" not in plan and not plan.startswith("SCAN"), plan
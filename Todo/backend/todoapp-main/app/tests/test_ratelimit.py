@@ -0,0 +1,43 @@
+import pytest
+import cache
+import ratelimit
+from ratelimit import MemoryStore, Rate
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_bucket_allows_a_burst_then_refills_over_the_period():
+    store = MemoryStore()
+    rate = Rate(3, 60)
+    assert [await store.take("k", rate) for _ in range(3)] == [0.0, 0.0, 0.0]
+    retry_after = await store.take("k", rate)
+    assert 19 < retry_after <= 20
+    assert await store.take("other", rate) == 0.0
+
+
+async def test_login_attempts_are_limited_per_username(client, monkeypatch):
+    monkeypatch.setattr(ratelimit.rate_limiter, "enabled", True)
+    monkeypatch.setattr(ratelimit.rate_limiter, "store", MemoryStore())
+    monkeypatch.setattr(ratelimit.rate_limiter, "username_rate", Rate(2, 60))
+    monkeypatch.setattr(ratelimit.rate_limiter, "ip_rates", {})
+
+    codes = [(await client.post("/auth/token", json={"username": "bob", "password": "x"})).status_code for _ in range(3)]
+    assert codes == [401, 401, 429]
+    assert (await client.post("/auth/token", json={"username": "alice", "password": "x"})).status_code == 401
+
+
+async def test_full_route_group_is_shed(client, admin_headers, monkeypatch):
+    monkeypatch.setitem(ratelimit.admission.limits, "write", 1)
+    monkeypatch.setitem(ratelimit.admission.in_flight, "write", 1)
+    response = await client.post("/admin/createTask", json={"title": "t"}, headers=admin_headers)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_redis_users_share_one_client(monkeypatch):
+    class FakeRedis:
+        def register_script(self, script):
+            return script
+
+    monkeypatch.setattr(cache, "_redis_client", FakeRedis())
+    assert ratelimit.RedisStore().client is cache.RedisBackend().client
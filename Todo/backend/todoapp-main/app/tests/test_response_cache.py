@@ -0,0 +1,36 @@
+import pytest
+import cache
+from cache import MemoryBackend
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def memory_cache(monkeypatch):
+    monkeypatch.setattr(cache.response_cache, "backend", MemoryBackend())
+    monkeypatch.setattr(cache.response_cache, "hits", 0)
+    monkeypatch.setattr(cache.response_cache, "misses", 0)
+    return cache.response_cache
+
+
+@pytest.mark.parametrize("path", ["/task/1", "/admin/getTasks"])
+async def test_cached_responses_revalidate_and_follow_writes(client, admin_headers, memory_cache, path):
+    await client.post("/admin/createTask", json={"title": "old"}, headers=admin_headers)
+
+    first = await client.get(path, headers=admin_headers)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert memory_cache.misses == 1
+
+    cached = await client.get(path, headers={**admin_headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+    assert cached.content == b""
+    assert memory_cache.hits == 1
+
+    await client.put("/admin/update-task/1", json={"title": "new"}, headers=admin_headers)
+
+    fresh = await client.get(path, headers={**admin_headers, "If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["ETag"] != etag
+    assert "new" in fresh.text and "old" not in fresh.text
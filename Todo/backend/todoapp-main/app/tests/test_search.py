@@ -0,0 +1,47 @@
+import base64
+import json
+import pytest
+from sqlalchemy import insert
+from database import engine
+from models import Task
+
+pytestmark = pytest.mark.anyio
+
+
+def raw_cursor(values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+async def search_all(client, headers, **params) -> list:
+    seen, cursor = [], None
+    while True:
+        response = await client.get("/task/search", params={**params, **({"cursor": cursor} if cursor else {})}, headers=headers)
+        assert response.status_code == 200, response.text
+        seen += [task["id"] for task in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return seen
+
+
+async def test_keyset_pages_cover_every_task_once(client, admin_headers):
+    async with engine.begin() as conn:
+        await conn.execute(insert(Task), [{"title": f"task {i % 3}"} for i in range(7)])
+
+    assert await search_all(client, admin_headers, sort="id", limit=3) == list(range(1, 8))
+    assert await search_all(client, admin_headers, sort="-id", limit=3) == list(range(7, 0, -1))
+    assert await search_all(client, admin_headers, sort="title", limit=2) == [1, 4, 7, 2, 5, 3, 6]
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    raw_cursor([{"a": 1}, 2]),
+    raw_cursor(["title", {"a": 1}, 2]),
+    raw_cursor(["title", "task", "2"]),
+    raw_cursor(["id", True, 2]),
+    raw_cursor(["title", "task 1"]),
+    raw_cursor(["title", "task 1", 2]),  # issued under title, replayed under id
+])
+async def test_malformed_cursor_is_rejected(client, admin_headers, cursor):
+    response = await client.get("/task/search", params={"sort": "id", "cursor": cursor}, headers=admin_headers)
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor."}
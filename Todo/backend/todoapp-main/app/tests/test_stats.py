@@ -0,0 +1,73 @@
+import pytest
+from sqlalchemy import insert, update
+from database import async_session, engine
+from models import AssignmentCount, Task, User
+from stats import actual_counts, reconcile_assignment_counts, stored_counts
+
+pytestmark = pytest.mark.anyio
+
+
+async def counters_match_group_by() -> bool:
+    async with async_session() as db:
+        # Counters that dropped to zero linger until reconciliation prunes them
+        return +await stored_counts(db) == +await actual_counts(db)
+
+
+@pytest.fixture
+async def seeded(client, admin_headers):
+    async with engine.begin() as conn:
+        await conn.execute(insert(Task), [{"title": f"task {i}"} for i in range(4)])
+        await conn.execute(insert(User), [{"username": f"user{i}", "hashed_password": "x"} for i in range(3)])
+    return admin_headers  # users 2-4, tasks 1-4
+
+
+async def test_counters_follow_every_assignment_change(client, seeded):
+    headers = seeded
+    for task_id, user_id in [(1, 2), (1, 3), (2, 2), (3, 4)]:
+        assert (await client.post("/admin/assign-task", params={"task_id": task_id, "user_id": user_id}, headers=headers)).status_code == 200
+    await client.post("/admin/assign-task", params={"task_id": 1, "user_id": 2}, headers=headers)  # repeat
+    await client.post("/admin/assign-tasks:bulk", json=[{"task_id": 4, "user_id": 2}, {"task_id": 4, "user_id": 3}, {"task_id": 1, "user_id": 2}], headers=headers)
+    assert await counters_match_group_by()
+
+    assert (await client.delete("/admin/unassign-task/1/3", headers=headers)).status_code == 200
+    assert (await client.delete("/admin/delete-task/4", headers=headers)).status_code == 200
+    assert await counters_match_group_by()
+
+    response = await client.get("/admin/stats", headers=headers)
+    assert response.json() == {"total": 3, "by_status": {"pending": 3}}
+
+
+async def test_stats_pages_by_user_and_task(client, seeded):
+    headers = seeded
+    for task_id in (1, 2, 3):
+        for user_id in (2, 3, 4):
+            await client.post("/admin/assign-task", params={"task_id": task_id, "user_id": user_id}, headers=headers)
+
+    for scope in ("user", "task"):
+        entries, cursor = [], None
+        while True:
+            response = await client.get(f"/admin/stats/{scope}s", params={"limit": 2, **({"cursor": cursor} if cursor else {})}, headers=headers)
+            entries += response.json()
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+        assert [entry["total"] for entry in entries] == [3, 3, 3]
+        assert [entry["by_status"] for entry in entries] == [{"pending": 3}] * 3
+
+    response = await client.get("/admin/stats/users", params={"cursor": "bogus"}, headers=headers)
+    assert response.status_code == 400
+
+
+async def test_reconciliation_repairs_drift(client, seeded):
+    headers = seeded
+    await client.post("/admin/assign-task", params={"task_id": 1, "user_id": 2}, headers=headers)
+    await client.delete("/admin/unassign-task/1/2", headers=headers)
+    await client.post("/admin/assign-task", params={"task_id": 2, "user_id": 3}, headers=headers)
+    async with engine.begin() as conn:
+        await conn.execute(update(AssignmentCount).where(AssignmentCount.scope == "user", AssignmentCount.key == 3).values(count=99))
+
+    assert not await counters_match_group_by()
+    result = await reconcile_assignment_counts({})
+    assert (result["corrected"], result["removed"]) == (1, 2)
+    assert await counters_match_group_by()
+    assert await reconcile_assignment_counts({}) == {**result, "corrected": 0, "removed": 0}
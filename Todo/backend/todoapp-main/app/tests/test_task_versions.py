@@ -0,0 +1,54 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def task_etag(client, admin_headers) -> str:
+    await client.post("/admin/createTask", json={"title": "draft", "description": "keep me"}, headers=admin_headers)
+    return (await client.get("/task/1", headers=admin_headers)).headers["ETag"]
+
+
+async def test_etag_from_get_round_trips_through_if_match(client, admin_headers, task_etag):
+    response = await client.put(
+        "/admin/update-task/1", json={"title": "final"}, headers={**admin_headers, "If-Match": task_etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != task_etag
+    assert (await client.get("/task/1", headers=admin_headers)).headers["ETag"] == response.headers["ETag"]
+
+
+async def test_stale_version_is_rejected(client, admin_headers, task_etag):
+    await client.patch("/admin/update-task/1", json={"title": "theirs"}, headers=admin_headers)
+
+    response = await client.patch(
+        "/admin/update-task/1", json={"title": "mine"}, headers={**admin_headers, "If-Match": task_etag}
+    )
+    assert response.status_code == 412
+    # The current tag comes back so the client can reload and retry
+    assert response.headers["ETag"] == (await client.get("/task/1", headers=admin_headers)).headers["ETag"]
+    assert (await client.get("/task/1", headers=admin_headers)).json()["title"] == "theirs"
+
+
+@pytest.mark.parametrize("tag", ['"abc123"', '"v"', "v1", '"v1x"'])
+async def test_foreign_tags_never_match(client, admin_headers, task_etag, tag):
+    response = await client.patch("/admin/update-task/1", json={"title": "mine"}, headers={**admin_headers, "If-Match": tag})
+    assert response.status_code == 412
+
+
+async def test_missing_task_is_not_found(client, admin_headers, task_etag):
+    response = await client.patch("/admin/update-task/9", json={"title": "mine"}, headers={**admin_headers, "If-Match": task_etag})
+    assert response.status_code == 404
+
+
+async def test_patch_changes_only_the_fields_sent(client, admin_headers, task_etag):
+    response = await client.patch(
+        "/admin/update-task/1", json={"title": "renamed"}, headers={**admin_headers, "If-Match": f"W/{task_etag}"}
+    )
+    assert response.status_code == 200
+    assert (await client.get("/task/1", headers=admin_headers)).json() == {"id": 1, "title": "renamed", "description": "keep me"}
+
+    response = await client.patch("/admin/update-task/1", json={"description": None}, headers=admin_headers)
+    assert response.status_code == 200
+    assert (await client.get("/task/1", headers=admin_headers)).json()["description"] is None
+    assert (await client.patch("/admin/update-task/1", json={}, headers=admin_headers)).status_code == 400
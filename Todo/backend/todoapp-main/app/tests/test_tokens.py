@@ -0,0 +1,60 @@
+import pytest
+from revocation import denylist
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def tokens(client) -> dict:
+    response = await client.post("/auth/register", json={"username": "alice", "password": "secret"})
+    return response.json()  # alice is user 1
+
+
+def bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def refresh(client, refresh_token: str):
+    return await client.post("/auth/refresh", json={"refresh_token": refresh_token})
+
+
+async def test_refresh_rotates_the_token(client, tokens):
+    response = await refresh(client, tokens["refresh_token"])
+    assert response.status_code == 200
+    rotated = response.json()
+    assert rotated["refresh_token"] != tokens["refresh_token"]
+    assert (await client.get("/user/tasks/1", headers=bearer(rotated["access_token"]))).status_code == 200
+    assert (await refresh(client, rotated["refresh_token"])).status_code == 200
+
+
+async def test_reusing_a_refresh_token_revokes_its_family(client, tokens):
+    rotated = (await refresh(client, tokens["refresh_token"])).json()
+    assert (await refresh(client, tokens["refresh_token"])).status_code == 401
+    # The legitimate holder's newer token went with it
+    assert (await refresh(client, rotated["refresh_token"])).status_code == 401
+
+
+async def test_logout_revokes_both_tokens(client, tokens):
+    response = await client.post(
+        "/auth/logout", json={"refresh_token": tokens["refresh_token"]}, headers=bearer(tokens["access_token"])
+    )
+    assert response.status_code == 200
+    assert (await client.get("/user/tasks/1", headers=bearer(tokens["access_token"]))).status_code == 401
+    assert (await refresh(client, tokens["refresh_token"])).status_code == 401
+
+    # Another worker learns about the revocation from the table
+    denylist._entries.clear()
+    await denylist.sync()
+    assert (await client.get("/user/tasks/1", headers=bearer(tokens["access_token"]))).status_code == 401
+
+
+async def test_logout_with_a_bad_refresh_token_revokes_nothing(client, tokens):
+    response = await client.post("/auth/logout", json={"refresh_token": "garbage"}, headers=bearer(tokens["access_token"]))
+    assert response.status_code == 401
+    assert (await client.get("/user/tasks/1", headers=bearer(tokens["access_token"]))).status_code == 200
+
+
+async def test_token_types_are_not_interchangeable(client, tokens):
+    assert (await client.get("/user/tasks/1", headers=bearer(tokens["refresh_token"]))).status_code == 401
+    assert (await client.post("/auth/logout", headers=bearer(tokens["refresh_token"]))).status_code == 401
+    assert (await refresh(client, tokens["access_token"])).status_code == 401
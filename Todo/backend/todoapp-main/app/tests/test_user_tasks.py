@@ -0,0 +1,59 @@
+import pytest
+from sqlalchemy import insert
+from database import engine
+from models import Task, TaskAssignment, User
+
+pytestmark = pytest.mark.anyio
+
+
+async def seed_assignments(user_id: int, count: int):
+    async with engine.begin() as conn:
+        result = await conn.execute(insert(Task).returning(Task.id), [{"title": f"task {i}"} for i in range(count)])
+        task_ids = list(result.scalars())
+        await conn.execute(insert(TaskAssignment), [{"task_id": task_id, "user_id": user_id, "status": "pending"} for task_id in task_ids])
+
+
+async def user_id(username: str) -> int:
+    async with engine.connect() as conn:
+        return (await conn.execute(User.__table__.select().where(User.username == username))).first().id
+
+
+async def statements_for_page(client, headers, statements, user_id: int) -> int:
+    statements.count = 0
+    response = await client.get(f"/user/tasks/{user_id}", params={"limit": 1000}, headers=headers)
+    assert response.status_code == 200
+    return statements.count
+
+
+async def test_statement_count_does_not_grow_with_assignments(client, admin_headers, statements):
+    async with engine.begin() as conn:
+        await conn.execute(insert(User), [{"username": "few", "hashed_password": "x"}, {"username": "many", "hashed_password": "x"}])
+    few, many = await user_id("few"), await user_id("many")
+    await seed_assignments(few, 10)
+    await seed_assignments(many, 10_000)
+    await client.get(f"/user/tasks/{few}", headers=admin_headers)  # authentication is cached after this
+
+    assert await statements_for_page(client, admin_headers, statements, few) == await statements_for_page(
+        client, admin_headers, statements, many
+    )
+
+
+async def test_pages_and_status_filter(client, admin_headers):
+    async with engine.begin() as conn:
+        await conn.execute(insert(User), [{"username": "paged", "hashed_password": "x"}])
+    paged = await user_id("paged")
+    await seed_assignments(paged, 5)
+    async with engine.begin() as conn:
+        await conn.execute(TaskAssignment.__table__.update().where(TaskAssignment.task_id <= 2).values(status="done"))
+
+    seen, cursor = [], None
+    while True:
+        response = await client.get(f"/user/tasks/{paged}", params={"limit": 2, **({"cursor": cursor} if cursor else {})}, headers=admin_headers)
+        seen += [task["id"] for task in response.json()["tasks"]]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert seen == [1, 2, 3, 4, 5]
+
+    response = await client.get(f"/user/tasks/{paged}", params={"status": "done"}, headers=admin_headers)
+    assert [task["status"] for task in response.json()["tasks"]] == ["done", "done"]
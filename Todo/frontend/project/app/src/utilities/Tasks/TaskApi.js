@@ -34,18 +34,27 @@ export const CreateTask = async (title, description) => {
 export const GetAllTasks = async () => {
   try {
     const token = getAuthToken();  // Ensure token is retrieved
-    const response = await axios.get(`${API_ADMIN}/getTasks`, {
-      headers: {
-        "Content-Type": "application/json",
-        Authorization: `Bearer ${token}`,
-      },
-    });
+    const tasks = [];
+    let cursor = null;
 
-    if (response.status === 200) {
-      return { success: true, tasks: response.data };
-    } else {
-      return { success: false, message: "Unexpected response status." };
-    }
+    // Tasks come one page at a time; the next page's cursor is in X-Next-Cursor
+    do {
+      const response = await axios.get(`${API_ADMIN}/getTasks`, {
+        params: cursor ? { cursor, limit: 1000 } : { limit: 1000 },
+        headers: {
+          "Content-Type": "application/json",
+          Authorization: `Bearer ${token}`,
+        },
+      });
+
+      if (response.status !== 200) {
+        return { success: false, message: "Unexpected response status." };
+      }
+      tasks.push(...response.data);
+      cursor = response.headers["x-next-cursor"];
+    } while (cursor);
+
+    return { success: true, tasks };
   } catch (error) {
     return formatError(error);
   }